@@ -23,7 +23,7 @@
 # GNU Lesser General Public License along
 # with QtUtilities.  If not,
 # see <https://www.gnu.org/licenses/>.
-from . import requests, signals, utils, widgets
+from . import aio, requests, signals, utils, widgets
 
-__all__ = {"requests", "widgets", "signals", "utils"}
+__all__ = {"aio", "requests", "widgets", "signals", "utils"}
 __version__ = (0, 4, 0)
@@ -0,0 +1,245 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import asyncio
+import math
+import selectors
+import sys
+import threading
+import typing
+
+from PyQt5 import QtCore
+
+__all__ = ['QtEventLoop', 'QtEventLoopPolicy', 'run']
+
+
+class _QtSelector(selectors.DefaultSelector):
+    """A selector that never blocks, and instead wakes its event loop through
+    QSocketNotifiers whenever a registered file descriptor becomes ready."""
+    
+    def __init__(self):
+        # Super call
+        super(_QtSelector, self).__init__()
+        
+        # Private attributes
+        self._loop: typing.Optional['QtEventLoop'] = None
+        self._notifiers: typing.Dict[int, typing.List[QtCore.QSocketNotifier]] = {}
+    
+    # Selector methods
+    def register(self, fileobj, events, data=None):
+        key = super(_QtSelector, self).register(fileobj, events, data)
+        self._update_notifiers(key.fd, events)
+        
+        return key
+    
+    def unregister(self, fileobj):
+        key = super(_QtSelector, self).unregister(fileobj)
+        self._update_notifiers(key.fd, 0)
+        
+        return key
+    
+    def modify(self, fileobj, events, data=None):
+        key = super(_QtSelector, self).modify(fileobj, events, data)
+        self._update_notifiers(key.fd, events)
+        
+        return key
+    
+    def select(self, timeout=None):
+        # The Qt event loop does the waiting, so polling must never block.
+        return super(_QtSelector, self).select(0)
+    
+    def close(self):
+        for fd in list(self._notifiers):
+            self._update_notifiers(fd, 0)
+        
+        super(_QtSelector, self).close()
+    
+    # Internal methods
+    def _update_notifiers(self, fd: int, events: int):
+        """Replaces the socket notifiers watching `fd` with ones watching
+        `events`."""
+        for notifier in self._notifiers.pop(fd, []):
+            notifier.setEnabled(False)
+            notifier.deleteLater()
+        
+        notifiers = []
+        
+        if events & selectors.EVENT_READ:
+            notifiers.append(QtCore.QSocketNotifier(fd, QtCore.QSocketNotifier.Read))
+        
+        if events & selectors.EVENT_WRITE:
+            notifiers.append(QtCore.QSocketNotifier(fd, QtCore.QSocketNotifier.Write))
+        
+        for notifier in notifiers:
+            notifier.activated.connect(self._wake)
+        
+        if notifiers:
+            self._notifiers[fd] = notifiers
+    
+    def _wake(self, *_):
+        """Asks the owning event loop to process ready file descriptors."""
+        if self._loop is not None:
+            self._loop._wake()
+
+
+class QtEventLoop(asyncio.SelectorEventLoop):
+    """An asyncio event loop that runs on top of the Qt event loop.
+    
+    Coroutines scheduled on this loop run between Qt events, so they can
+    await signals and replies without spinning nested event loops.  A
+    QCoreApplication must exist before the loop is run."""
+    
+    def __init__(self):
+        # Declarations
+        selector = _QtSelector()
+        
+        # Super call
+        super(QtEventLoop, self).__init__(selector=selector)
+        
+        # Private attributes
+        self._qt_loop: typing.Optional[QtCore.QEventLoop] = None
+        self._ticking = False
+        self._timer = QtCore.QTimer()
+        
+        # Internal calls
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        
+        selector._loop = self
+    
+    # Loop methods
+    def run_forever(self):
+        """Runs the Qt event loop until `stop` is called."""
+        if QtCore.QCoreApplication.instance() is None:
+            raise RuntimeError('A QCoreApplication must exist before the event loop can run!')
+        
+        self._check_closed()
+        self._check_running()
+        self._set_coroutine_origin_tracking(self._debug)
+        
+        old_agen_hooks = sys.get_asyncgen_hooks()
+        
+        try:
+            self._thread_id = threading.get_ident()
+            sys.set_asyncgen_hooks(firstiter=self._asyncgen_firstiter_hook, finalizer=self._asyncgen_finalizer_hook)
+            asyncio.events._set_running_loop(self)
+            
+            self._qt_loop = QtCore.QEventLoop()
+            self._wake()
+            self._qt_loop.exec()
+        
+        finally:
+            self._timer.stop()
+            self._qt_loop = None
+            self._stopping = False
+            self._thread_id = None
+            asyncio.events._set_running_loop(None)
+            self._set_coroutine_origin_tracking(False)
+            sys.set_asyncgen_hooks(*old_agen_hooks)
+    
+    def stop(self):
+        super(QtEventLoop, self).stop()
+        self._wake()
+    
+    def call_at(self, when, callback, *args, context=None):
+        handle = super(QtEventLoop, self).call_at(when, callback, *args, context=context)
+        self._wake()
+        
+        return handle
+    
+    def close(self):
+        self._timer.stop()
+        super(QtEventLoop, self).close()
+    
+    # Internal methods
+    def _call_soon(self, callback, args, context):
+        handle = super(QtEventLoop, self)._call_soon(callback, args, context)
+        self._wake()
+        
+        return handle
+    
+    def _wake(self):
+        """Schedules an iteration of the asyncio loop on the Qt event loop."""
+        if self._qt_loop is None or self._ticking:
+            return
+        
+        # Timers can't be started from other threads, so `call_soon_threadsafe`
+        # relies on the self-pipe's notifier to wake the loop instead.
+        if threading.get_ident() != self._thread_id:
+            return
+        
+        self._timer.start(0)
+    
+    def _tick(self):
+        """Runs a single iteration of the asyncio loop, then schedules the
+        next one."""
+        self._ticking = True
+        
+        try:
+            self._run_once()
+        
+        finally:
+            self._ticking = False
+        
+        if self._stopping:
+            self._qt_loop.quit()
+        
+        elif self._ready:
+            self._timer.start(0)
+        
+        elif self._scheduled:
+            delay = max(0.0, self._scheduled[0]._when - self.time())
+            self._timer.start(math.ceil(delay * 1000))
+        
+        # Otherwise the loop is idle until a socket notifier, a Qt callback,
+        # or another thread wakes it.
+
+
+class QtEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """An event loop policy that creates QtEventLoops."""
+    _loop_factory = QtEventLoop
+
+
+def run(coro: typing.Coroutine, *, debug: bool = None):
+    """Runs `coro` on a new QtEventLoop, and returns its result.  This is the
+    Qt equivalent of `asyncio.run`."""
+    loop = QtEventLoop()
+    
+    try:
+        asyncio.set_event_loop(loop)
+        
+        if debug is not None:
+            loop.set_debug(debug)
+        
+        return loop.run_until_complete(coro)
+    
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
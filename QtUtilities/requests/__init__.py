@@ -23,7 +23,26 @@
 # GNU Lesser General Public License along
 # with QtUtilities.  If not,
 # see <https://www.gnu.org/licenses/>.
+from .batch import Batch, Request
+from .bodies import FileDevice, IteratorDevice, Multipart
+from .cache import DiskCache, MemoryCache, fingerprint
+from .compression import Compression
+from .downloads import RangedDownload
+from .events import Event, EventSource
 from .factory import Factory
+from .future import CancelToken, Future
+from .headers import Headers
+from .limits import RateLimiter, TokenBucket
+from .metrics import HostMetrics, Metrics, Timings
+from .pagination import CursorPagination, LinkPagination, OffsetPagination, Pagination
+from .prepared import PreparedRequest
 from .response import Response
+from .retry import RetryPolicy
+from .transport import ManagerTransport, Transport
+from .websocket import WebSocket, WebSocketPool
 
-__all__ = ['Factory', 'Response']
+__all__ = ['Batch', 'CancelToken', 'Compression', 'CursorPagination', 'DiskCache', 'Event', 'EventSource', 'Factory',
+           'FileDevice', 'Future', 'Headers', 'HostMetrics', 'IteratorDevice', 'LinkPagination', 'ManagerTransport',
+           'MemoryCache', 'Metrics', 'Multipart', 'OffsetPagination', 'Pagination', 'PreparedRequest', 'RangedDownload',
+           'RateLimiter', 'Request', 'Response', 'RetryPolicy', 'Timings', 'TokenBucket', 'Transport', 'WebSocket',
+           'WebSocketPool', 'fingerprint']
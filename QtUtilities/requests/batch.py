@@ -0,0 +1,191 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections
+import typing
+
+from PyQt5 import QtCore
+
+from .future import Future
+from .response import Response
+
+if typing.TYPE_CHECKING:
+    from .factory import Factory
+
+__all__ = ['Request', 'Batch']
+
+Request = collections.namedtuple('Request', ['op', 'url', 'params', 'headers', 'data'], defaults=(None, None, None))
+
+
+class Batch(QtCore.QObject):
+    """Dispatches many requests through a factory at once, while capping the
+    amount of requests in flight overall and per host.
+    
+    Responses are stored in the same order the requests were passed in."""
+    response_ready = QtCore.pyqtSignal(int, object)  # Emitted with the request's index and its Response.
+    finished = QtCore.pyqtSignal()  # Emitted when every request has finished.
+    
+    def __init__(self, factory: 'Factory', requests: typing.Iterable[typing.Union[Request, tuple, str, QtCore.QUrl]], *,
+                 max_in_flight: int = None, max_per_host: int = None, parent: QtCore.QObject = None):
+        # Super call
+        super(Batch, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.responses: typing.List[typing.Optional[Response]] = []
+        
+        # Private attributes
+        self._factory = factory
+        self._max_in_flight = max_in_flight
+        self._max_per_host = max_per_host
+        self._pending: typing.Dict[str, typing.Deque[typing.Tuple[int, Request]]] = collections.OrderedDict()
+        self._in_flight: typing.Dict[str, int] = collections.Counter()
+        self._futures: typing.Dict[int, Future] = {}
+        self._remaining = 0
+        self._started = False
+        self._finished = False
+        self._pumping = False
+        
+        # Request stitching
+        for index, request in enumerate(requests):
+            request = self._coerce(request)
+            host = QtCore.QUrl(request.url).host()
+            
+            self._pending.setdefault(host, collections.deque()).append((index, request))
+            self.responses.append(None)
+        
+        self._remaining = len(self.responses)
+    
+    # Properties
+    @property
+    def in_flight(self) -> int:
+        """The amount of requests currently in flight."""
+        return sum(self._in_flight.values())
+    
+    # State methods
+    def start(self):
+        """Dispatches as many requests as the limits allow."""
+        if self._started:
+            return
+        
+        self._started = True
+        
+        if self._remaining <= 0:
+            self._finish()
+        
+        else:
+            self._pump()
+    
+    def done(self) -> bool:
+        """Whether or not every request in the batch has finished."""
+        return self._started and self._remaining <= 0
+    
+    def cancel(self):
+        """Aborts every request in flight, and drops the requests that haven't
+        been sent yet.  Dropped requests won't have a response."""
+        dropped = sum(len(queue) for queue in self._pending.values())
+        self._pending.clear()
+        self._remaining -= dropped
+        
+        # Cancelled futures may be resolved immediately, which can finish the
+        # batch before this method does.
+        for future in list(self._futures.values()):
+            future.cancel()
+        
+        if self._started and self._remaining <= 0:
+            self._finish()
+    
+    # Internal methods
+    @staticmethod
+    def _coerce(request: typing.Union[Request, tuple, str, QtCore.QUrl]) -> Request:
+        """Converts the passed object into a Request."""
+        if isinstance(request, Request):
+            return request
+        
+        elif isinstance(request, (str, QtCore.QUrl)):
+            return Request('GET', request)
+        
+        elif isinstance(request, tuple):
+            return Request(*request)
+        
+        else:
+            raise TypeError(f'Cannot convert {request!r} into a request!')
+    
+    def _pump(self):
+        """Sends pending requests until the concurrency limits are reached."""
+        # Futures resolved immediately (ie. cached responses) invoke their
+        # callbacks while this method is still dispatching.
+        if self._pumping:
+            return
+        
+        self._pumping = True
+        
+        try:
+            for host in list(self._pending):
+                queue = self._pending.get(host)
+                
+                while queue:
+                    if self._max_in_flight is not None and self.in_flight >= self._max_in_flight:
+                        return
+                    
+                    if self._max_per_host is not None and self._in_flight[host] >= self._max_per_host:
+                        break
+                    
+                    index, request = queue.popleft()
+                    self._in_flight[host] += 1
+                    
+                    future = self._factory.submit(request.op, request.url, params=request.params,
+                                                  headers=request.headers, data=request.data)
+                    self._futures[index] = future
+                    
+                    future.add_done_callback(lambda f, i=index, h=host: self._on_done(i, h, f))
+                
+                if queue is not None and not queue:
+                    del self._pending[host]
+        
+        finally:
+            self._pumping = False
+    
+    def _on_done(self, index: int, host: str, future: Future):
+        """Stores a finished request's response, then sends the next requests."""
+        self._in_flight[host] -= 1
+        self._futures.pop(index, None)
+        self._remaining -= 1
+        
+        if future.exception() is None:
+            self.responses[index] = future.result()
+        
+        self.response_ready.emit(index, self.responses[index])
+        
+        if self._remaining <= 0:
+            self._finish()
+        
+        else:
+            self._pump()
+    
+    def _finish(self):
+        """Emits `finished`, unless the batch already has."""
+        if not self._finished:
+            self._finished = True
+            self.finished.emit()
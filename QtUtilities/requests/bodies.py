@@ -0,0 +1,238 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import io
+import os
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+__all__ = ['FileDevice', 'IteratorDevice', 'Multipart']
+
+
+class FileDevice(QtCore.QIODevice):
+    """A QIODevice that reads from a binary Python file object.
+    
+    Reads are forwarded to the file as Qt asks for them, so the file's
+    contents are never held in memory at once.  The file isn't closed when
+    the device is."""
+    
+    def __init__(self, file: typing.BinaryIO, *, parent: QtCore.QObject = None):
+        # Super call
+        super(FileDevice, self).__init__(parent)
+        
+        # Private attributes
+        self._file = file
+        self._start = 0
+        self._size = None
+        
+        # Attribute validation
+        if self._seekable():
+            self._start = file.tell()
+            self._size = self._measure() - self._start
+        
+        self.open(QtCore.QIODevice.ReadOnly | QtCore.QIODevice.Unbuffered)
+    
+    # Device methods
+    def isSequential(self) -> bool:
+        return self._size is None
+    
+    def size(self) -> int:
+        return self.bytesAvailable() if self._size is None else self._size
+    
+    def seek(self, pos: int) -> bool:
+        if self._size is None or not super(FileDevice, self).seek(pos):
+            return False
+        
+        self._file.seek(self._start + pos)
+        
+        return True
+    
+    def readData(self, max_size: int) -> bytes:
+        return self._file.read(max_size)
+    
+    def writeData(self, data: bytes) -> int:
+        return -1
+    
+    # Internal methods
+    def _seekable(self) -> bool:
+        """Returns whether or not the file supports random access."""
+        try:
+            return self._file.seekable()
+        
+        except (AttributeError, ValueError):
+            return False
+    
+    def _measure(self) -> int:
+        """Returns the total size of the file."""
+        try:
+            return os.fstat(self._file.fileno()).st_size
+        
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            position = self._file.tell()
+            size = self._file.seek(0, io.SEEK_END)
+            self._file.seek(position)
+            
+            return size
+
+
+class IteratorDevice(QtCore.QIODevice):
+    """A sequential QIODevice that reads from an iterator of chunks.
+    
+    Chunks are only pulled from the iterator as Qt asks for more data, so a
+    generator can produce a body of any size without it being held in
+    memory.  Qt can only send a sequential body without buffering it when
+    its length is known, so `size` should be passed alongside it; otherwise
+    the factory spools the chunks to a temporary file before sending them."""
+    
+    def __init__(self, chunks: typing.Iterable[typing.AnyStr], *, size: int = None, parent: QtCore.QObject = None):
+        # Super call
+        super(IteratorDevice, self).__init__(parent)
+        
+        # Public attributes
+        self.length = size
+        
+        # Private attributes
+        self._chunks = iter(chunks)
+        self._pending = b''
+        
+        self.open(QtCore.QIODevice.ReadOnly | QtCore.QIODevice.Unbuffered)
+    
+    # Device methods
+    def isSequential(self) -> bool:
+        return True
+    
+    def bytesAvailable(self) -> int:
+        self._fill()
+        
+        return len(self._pending) + super(IteratorDevice, self).bytesAvailable()
+    
+    def readData(self, max_size: int) -> bytes:
+        self._fill()
+        
+        data, self._pending = self._pending[:max_size], self._pending[max_size:]
+        
+        return data
+    
+    def writeData(self, data: bytes) -> int:
+        return -1
+    
+    # Internal methods
+    def _fill(self):
+        """Pulls the next non-empty chunk from the iterator, if there isn't
+        one pending already."""
+        while not self._pending and self._chunks is not None:
+            chunk = next(self._chunks, None)
+            
+            if chunk is None:
+                self._chunks = None
+            
+            elif isinstance(chunk, str):
+                self._pending = chunk.encode(encoding='UTF-8')
+            
+            else:
+                self._pending = bytes(chunk)
+
+
+class Multipart(QtNetwork.QHttpMultiPart):
+    """A multipart/form-data body.
+    
+    Files added to the body are read as the request is sent, instead of being
+    loaded into memory beforehand.  `files` maps field names to a file, or to
+    a `(filename, file)` or `(filename, file, content_type)` tuple."""
+    
+    def __init__(self, fields: typing.Dict[str, typing.AnyStr] = None, files: typing.Dict[str, typing.Any] = None, *,
+                 parent: QtCore.QObject = None):
+        # Super call
+        super(Multipart, self).__init__(QtNetwork.QHttpMultiPart.FormDataType, parent)
+        
+        # Private attributes
+        self._devices: typing.List[QtCore.QIODevice] = []  # Keeps the parts' devices alive until the body is sent
+        
+        # Attribute validation
+        for name, value in (fields or {}).items():
+            self.add_field(name, value)
+        
+        for name, value in (files or {}).items():
+            if isinstance(value, tuple):
+                filename, file, *content_type = value
+                self.add_file(name, file, filename, *content_type)
+            
+            else:
+                self.add_file(name, value)
+    
+    def add_field(self, name: str, value: typing.AnyStr, *, content_type: str = None):
+        """Adds a plain form field to the body."""
+        part = self._part(f'form-data; name="{name}"', content_type)
+        part.setBody(value.encode(encoding='UTF-8') if isinstance(value, str) else bytes(value))
+        
+        self.append(part)
+    
+    def add_file(self, name: str, file: typing.Union[str, typing.BinaryIO, QtCore.QIODevice],
+                 filename: str = None, content_type: str = 'application/octet-stream'):
+        """Adds a file to the body.
+        
+        `file` may be a path, an open binary file, or a QIODevice.  If
+        `filename` isn't passed, the file's own name will be used."""
+        # Declarations
+        device = self._device(file)
+        
+        if filename is None:
+            filename = os.path.basename(getattr(file, 'name', None) or (file if isinstance(file, str) else name))
+        
+        part = self._part(f'form-data; name="{name}"; filename="{filename}"', content_type)
+        part.setBodyDevice(device)
+        
+        self._devices.append(device)
+        self.append(part)
+    
+    # Internal methods
+    @staticmethod
+    def _part(disposition: str, content_type: typing.Optional[str]) -> QtNetwork.QHttpPart:
+        """Creates a new part with the given headers."""
+        part = QtNetwork.QHttpPart()
+        part.setHeader(QtNetwork.QNetworkRequest.ContentDispositionHeader, disposition)
+        
+        if content_type is not None:
+            part.setHeader(QtNetwork.QNetworkRequest.ContentTypeHeader, content_type)
+        
+        return part
+    
+    def _device(self, file: typing.Union[str, typing.BinaryIO, QtCore.QIODevice]) -> QtCore.QIODevice:
+        """Converts a file passed to `add_file` into an open QIODevice."""
+        if isinstance(file, QtCore.QIODevice):
+            device = file
+        
+        elif isinstance(file, str):
+            device = QtCore.QFile(file, self)
+        
+        else:
+            device = FileDevice(file, parent=self)
+        
+        if not device.isOpen() and not device.open(QtCore.QIODevice.ReadOnly):
+            raise IOError(f'Could not open "{file}" for reading! ({device.errorString()})')
+        
+        return device
+
@@ -0,0 +1,283 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections
+import os
+import time
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+if typing.TYPE_CHECKING:
+    from .response import Response
+
+__all__ = ['DiskCache', 'MemoryCache', 'fingerprint']
+
+
+def fingerprint(op: str, request: QtNetwork.QNetworkRequest, *, vary: typing.Iterable[str] = ()) -> tuple:
+    """Generates a hashable key identifying a request.
+    
+    The key is made from the operation, the request's normalized url with its
+    query items sorted, and the values of the headers named in `vary`."""
+    # Url normalization
+    url: QtCore.QUrl = request.url().adjusted(QtCore.QUrl.NormalizePathSegments | QtCore.QUrl.RemoveFragment)
+    query = QtCore.QUrlQuery(url)
+    items = tuple(sorted(query.queryItems(QtCore.QUrl.FullyEncoded)))
+    url = url.adjusted(QtCore.QUrl.RemoveQuery)
+    
+    # Header selection
+    headers = tuple(request.rawHeader(name.encode(encoding='UTF-8')).data() for name in vary)
+    
+    return op.upper(), url.toString(QtCore.QUrl.FullyEncoded), items, headers
+
+
+class MemoryCache:
+    """A process-local response cache with a time-to-live, and limits on the
+    amount of entries and bytes it holds.
+    
+    Entries are keyed by `fingerprint`, and the least recently used entries are
+    evicted first once either limit is exceeded.  Only successful GET and HEAD
+    responses are cached."""
+    
+    def __init__(self, *, ttl: float = 60, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024,
+                 vary: typing.Iterable[str] = ('Accept', 'Authorization')):
+        # Public attributes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.vary = tuple(vary)
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        # Private attributes
+        self._entries: typing.Dict[tuple, typing.Tuple[float, int, 'Response']] = collections.OrderedDict()
+        self._size = 0
+    
+    # Properties
+    @property
+    def size(self) -> int:
+        """The amount of body bytes currently cached."""
+        return self._size
+    
+    # Cache methods
+    def key(self, op: str, request: QtNetwork.QNetworkRequest) -> tuple:
+        """Generates the cache key for a request."""
+        return fingerprint(op, request, vary=self.vary)
+    
+    def get(self, key: tuple) -> typing.Optional['Response']:
+        """Returns a copy of the response cached under `key`, or None if there
+        isn't a fresh one.  Copies share the cached body, but each has its own
+        decoded json."""
+        entry = self._entries.get(key)
+        
+        if entry is None:
+            self.misses += 1
+            
+            return None
+        
+        expires, _, response = entry
+        
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        
+        return response._copy()
+    
+    def put(self, key: tuple, response: 'Response', *, ttl: float = None):
+        """Caches `response` under `key`.  Responses larger than the cache
+        itself, or marked with `Cache-Control: no-store`, are ignored."""
+        length = len(response.body)
+        
+        if length > self.max_bytes or 'no-store' in response.headers.get('Cache-Control', '').lower():
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), length, response)
+        self._size += length
+        
+        # Entry eviction
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def invalidate(self, key: tuple) -> bool:
+        """Removes the response cached under `key`.
+        
+        :returns bool: Whether or not a response was removed."""
+        if key not in self._entries:
+            return False
+        
+        self._remove(key)
+        
+        return True
+    
+    def clear(self):
+        """Removes every cached response."""
+        self._entries.clear()
+        self._size = 0
+    
+    def stats(self) -> typing.Dict[str, int]:
+        """Returns the cache's counters, for monitoring."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'entries': len(self._entries),
+            'bytes': self._size
+        }
+    
+    # Internal methods
+    def _remove(self, key: tuple):
+        """Removes an entry, and updates the cache's size."""
+        _, length, _ = self._entries.pop(key)
+        self._size -= length
+    
+    # Magic methods
+    def __len__(self):
+        return len(self._entries)
+    
+    def __contains__(self, key: tuple):
+        return key in self._entries
+
+
+class DiskCache(QtNetwork.QNetworkDiskCache):
+    """A persistent HTTP cache that evicts the least recently used entries.
+    
+    QNetworkDiskCache evicts the oldest entries first, regardless of how often
+    they're used.  This cache tracks when entries are read, and persists the
+    access times through the cache files' modification times, so frequently
+    used entries survive across sessions.  Revalidation through `If-None-Match`
+    and `If-Modified-Since` is handled by QNetworkAccessManager itself."""
+    
+    def __init__(self, directory: str, *, max_size: int = None, parent: QtCore.QObject = None):
+        # Super call
+        super(DiskCache, self).__init__(parent)
+        
+        # Private attributes
+        self._accessed: typing.Dict[str, float] = {}
+        
+        # Internal calls
+        self.setCacheDirectory(directory)
+        
+        if max_size is not None:
+            self.setMaximumCacheSize(max_size)
+    
+    # Cache methods
+    def data(self, url: QtCore.QUrl) -> typing.Optional[QtCore.QIODevice]:
+        device = super(DiskCache, self).data(url)
+        
+        if device is not None:
+            self._accessed[url.toString()] = time.time()
+        
+        return device
+    
+    def remove(self, url: QtCore.QUrl) -> bool:
+        self._accessed.pop(url.toString(), None)
+        
+        return super(DiskCache, self).remove(url)
+    
+    def clear(self):
+        self._accessed.clear()
+        super(DiskCache, self).clear()
+    
+    def expire(self) -> int:
+        """Removes the least recently used entries until the cache is 90% of
+        its maximum size.
+        
+        :returns int: The size of the cache after expiring entries."""
+        # Declarations
+        entries: typing.List[typing.Tuple[float, int, str]] = []
+        size = 0
+        
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            
+            except OSError:
+                continue
+            
+            entries.append((stat.st_mtime, stat.st_size, path))
+            size += stat.st_size
+        
+        if size <= self.maximumCacheSize():
+            return size
+        
+        # Entry sorting
+        for index, (modified, length, path) in enumerate(entries):
+            url = self.fileMetaData(path).url().toString()
+            accessed = self._accessed.get(url)
+            
+            if accessed is not None and accessed > modified:
+                # Persist the access time, so it survives into future sessions
+                try:
+                    os.utime(path, (accessed, accessed))
+                
+                except OSError:
+                    pass
+                
+                entries[index] = (accessed, length, path)
+        
+        entries.sort()
+        
+        # Entry eviction
+        goal = self.maximumCacheSize() * 9 // 10
+        
+        for _, length, path in entries:
+            if size <= goal:
+                break
+            
+            url = self.fileMetaData(path).url()
+            
+            if not self.remove(url):
+                try:
+                    os.remove(path)
+                
+                except OSError:
+                    continue
+            
+            size -= length
+        
+        return size
+    
+    # Internal methods
+    def _files(self) -> typing.Iterator[str]:
+        """Yields the paths of every file stored in the cache."""
+        for root, _, files in os.walk(self.cacheDirectory()):
+            for file in files:
+                if file.endswith('.d'):
+                    yield os.path.join(root, file)
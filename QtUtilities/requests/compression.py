@@ -0,0 +1,242 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections
+import dataclasses
+import typing
+import zlib
+
+from PyQt5 import QtCore, QtNetwork
+
+from .bodies import FileDevice, IteratorDevice
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ['Compression', 'available_encodings', 'compressor', 'decompressor']
+
+Codec = collections.namedtuple('Codec', ['feed', 'flush'])
+
+_CHUNK_SIZE = 64 * 1024
+_QT_ENCODINGS = frozenset({'gzip', 'deflate'})  # The encodings QNetworkAccessManager decompresses itself
+
+
+def available_encodings() -> typing.List[str]:
+    """Returns the content codings that can be compressed and decompressed,
+    from the most to the least preferred."""
+    encodings = ['gzip', 'deflate']
+    
+    if brotli is not None:
+        encodings.insert(0, 'br')
+    
+    if zstandard is not None:
+        encodings.insert(0, 'zstd')
+    
+    return encodings
+
+
+def compressor(encoding: str, level: int = None) -> Codec:
+    """Returns a codec that compresses a body one chunk at a time.
+    
+    :raises ValueError: The encoding isn't available."""
+    encoding = encoding.lower()
+    
+    if encoding in ('gzip', 'deflate'):
+        c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED,
+                             zlib.MAX_WBITS | 16 if encoding == 'gzip' else zlib.MAX_WBITS)
+        
+        return Codec(c.compress, c.flush)
+    
+    elif encoding == 'br' and brotli is not None:
+        c = brotli.Compressor() if level is None else brotli.Compressor(quality=level)
+        
+        return Codec(c.process, c.finish)
+    
+    elif encoding == 'zstd' and zstandard is not None:
+        c = zstandard.ZstdCompressor(**({} if level is None else {'level': level})).compressobj()
+        
+        return Codec(c.compress, c.flush)
+    
+    raise ValueError(f'The "{encoding}" encoding isn\'t available!')
+
+
+def decompressor(encoding: str) -> Codec:
+    """Returns a codec that decompresses a body one chunk at a time.  Unknown
+    encodings are passed through untouched."""
+    encoding = encoding.strip().lower()
+    
+    if encoding in ('gzip', 'x-gzip'):
+        d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        
+        return Codec(d.decompress, d.flush)
+    
+    elif encoding == 'deflate':
+        return _deflate_decompressor()
+    
+    elif encoding == 'br' and brotli is not None:
+        d = brotli.Decompressor()
+        
+        return Codec(d.process, bytes)
+    
+    elif encoding == 'zstd' and zstandard is not None:
+        d = zstandard.ZstdDecompressor().decompressobj()
+        
+        return Codec(d.decompress, bytes)
+    
+    return Codec(bytes, bytes)
+
+
+def _deflate_decompressor() -> Codec:
+    """Returns a codec for the deflate encoding.  Some hosts send raw deflate
+    streams instead of zlib wrapped ones, so the first chunk decides which
+    one is used."""
+    d = None
+    
+    def feed(data: bytes) -> bytes:
+        nonlocal d
+        
+        if d is None:
+            try:
+                d = zlib.decompressobj(zlib.MAX_WBITS)
+                
+                return d.decompress(data)
+            
+            except zlib.error:
+                d = zlib.decompressobj(-zlib.MAX_WBITS)
+        
+        return d.decompress(data)
+    
+    def flush() -> bytes:
+        return b'' if d is None else d.flush()
+    
+    return Codec(feed, flush)
+
+
+@dataclasses.dataclass(frozen=True)
+class Compression:
+    """Describes how a factory compresses request bodies and decompresses
+    response bodies.
+    
+    Request bodies at least `threshold` bytes large are compressed with
+    `encoding`.  If `decompress` is True and an encoding Qt can't decompress
+    itself is available, responses will be requested in it and decompressed
+    as they're read.
+    
+    :raises ValueError: The encoding isn't available."""
+    threshold: int = 1024
+    encoding: str = 'gzip'
+    level: typing.Optional[int] = None
+    decompress: bool = True
+    
+    def __post_init__(self):
+        if self.encoding not in available_encodings():
+            raise ValueError(f'The "{self.encoding}" encoding isn\'t available!')
+    
+    # Request methods
+    def accept_encoding(self) -> typing.Optional[bytes]:
+        """The value of the Accept-Encoding header sent with requests.  If Qt can
+        decompress every available encoding itself, None is returned."""
+        encodings = available_encodings()
+        
+        if not self.decompress or _QT_ENCODINGS.issuperset(encodings):
+            return None
+        
+        return ', '.join(encodings).encode(encoding='UTF-8')
+    
+    def compress(self, request: QtNetwork.QNetworkRequest, data: typing.Any) -> typing.Any:
+        """Compresses a request's body if it's large enough, and updates the
+        request's headers to match.
+        
+        In-memory bodies are compressed in memory, while other bodies are
+        compressed into a temporary file as they're read.
+        
+        :raises IOError: The temporary file couldn't be written to."""
+        if not isinstance(data, QtCore.QIODevice) or request.hasRawHeader(b'Content-Encoding'):
+            return data
+        
+        # Size validation
+        if data.isSequential():
+            # Only devices that can be drained synchronously can be compressed
+            if not isinstance(data, (IteratorDevice, FileDevice)):
+                return data
+            
+            size = request.header(QtNetwork.QNetworkRequest.ContentLengthHeader)
+            
+            if size is None and isinstance(data, IteratorDevice):
+                size = data.length
+        
+        else:
+            size = data.size() - data.pos()
+        
+        if size is not None and size < self.threshold:
+            return data
+        
+        # Body compression
+        codec = compressor(self.encoding, self.level)
+        
+        if isinstance(data, QtCore.QBuffer):
+            compressed = QtCore.QBuffer()
+            compressed.setData(codec.feed(data.readAll().data()) + codec.flush())
+            compressed.open(QtCore.QIODevice.ReadOnly)
+        
+        else:
+            compressed = QtCore.QTemporaryFile()
+            
+            if not compressed.open():
+                raise IOError(f'Could not create a temporary file for the request body! ({compressed.errorString()})')
+            
+            while True:
+                chunk = data.read(_CHUNK_SIZE)
+                
+                if not chunk:
+                    break
+                
+                self._write(compressed, codec.feed(chunk))
+            
+            self._write(compressed, codec.flush())
+            compressed.seek(0)
+        
+        request.setRawHeader(b'Content-Encoding', self.encoding.encode(encoding='UTF-8'))
+        request.setHeader(QtNetwork.QNetworkRequest.ContentLengthHeader, compressed.size())
+        
+        return compressed
+    
+    @staticmethod
+    def _write(file: QtCore.QFileDevice, data: bytes):
+        """Writes compressed data to a temporary file.
+        
+        :raises IOError: The data couldn't be written."""
+        if data and file.write(data) != len(data):
+            raise IOError(f'Could not compress the request body! ({file.errorString()})')
@@ -0,0 +1,463 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import functools
+import json
+import os
+import time
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+from .future import Future
+from .response import Response
+
+if typing.TYPE_CHECKING:
+    from .factory import Factory
+
+__all__ = ['RangedDownload']
+
+
+class _Part(QtCore.QIODevice):
+    """A byte range of a ranged download.  Data written to the part is written
+    into the download's file at the part's offset."""
+    
+    def __init__(self, file: QtCore.QFile, start: int, stop: int, done: int = 0):
+        # Super call
+        super(_Part, self).__init__()
+        
+        # Public attributes
+        self.start = start
+        self.stop = stop
+        self.done = done
+        self.attempt = 0
+        self.future: typing.Optional[Future] = None
+        self.error = ''
+        
+        # Private attributes
+        self._file = file
+        
+        self.open(QtCore.QIODevice.WriteOnly | QtCore.QIODevice.Unbuffered)
+    
+    # Properties
+    @property
+    def remaining(self) -> int:
+        """The amount of bytes the part has left to download."""
+        return self.stop - self.start - self.done
+    
+    # Device methods
+    def isSequential(self) -> bool:
+        return True
+    
+    def readData(self, max_size: int) -> bytes:
+        return b''
+    
+    def writeData(self, data: bytes) -> int:
+        # Hosts that ignore the range would overflow into the next part
+        data = data[:self.remaining]
+        
+        if not data:
+            return 0
+        
+        if not self._file.seek(self.start + self.done) or self._file.write(data) != len(data):
+            self.error = self._file.errorString()
+            
+            return -1
+        
+        self.done += len(data)
+        
+        return len(data)
+
+
+class RangedDownload(QtCore.QObject):
+    """Downloads a file through several byte range requests at once.
+    
+    The host is probed with a HEAD request first.  If it doesn't accept byte
+    ranges, or doesn't report the file's size, the file is downloaded through
+    a single request instead.  Otherwise the parts are written into their
+    offsets of a preallocated `<path>.part` file, which replaces the file at
+    `path` once every part has finished.
+    
+    Progress is checkpointed into a `<path>.part.json` sidecar, so downloads
+    that were interrupted can be resumed.  Checkpoints are only resumed if the
+    host still reports the same size and validators (`ETag` and
+    `Last-Modified`) for the file."""
+    MIN_PART_SIZE = 1024 * 1024  # The smallest amount of bytes worth downloading through a request of its own.
+    CHECKPOINT_INTERVAL = 1000  # The amount of milliseconds between checkpoints.
+    
+    def __init__(self, factory: 'Factory', request: QtNetwork.QNetworkRequest, path: str, *, parts: int = 4,
+                 resume: bool = True, idle_timeout: int = None, parent: QtCore.QObject = None):
+        # Super call
+        super(RangedDownload, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.path = path
+        self.future = Future()
+        
+        # Private attributes
+        self._factory = factory
+        self._request = request
+        self._parts_wanted = max(1, parts)
+        self._resume = resume
+        self._idle_timeout = idle_timeout
+        self._probe: typing.Optional[Response] = None
+        self._pending: typing.Optional[Future] = None  # The probe, or the fallback download
+        self._parts: typing.List[_Part] = []
+        self._file: typing.Optional[QtCore.QFile] = None
+        self._length = 0
+        self._finished = False
+        self._timer = QtCore.QTimer(self)
+        
+        self._timer.timeout.connect(self._checkpoint)
+        self.future._canceller = self._cancel
+    
+    # Properties
+    @property
+    def part_path(self) -> str:
+        """The path of the file the parts are written into."""
+        return self.path + '.part'
+    
+    @property
+    def checkpoint_path(self) -> str:
+        """The path of the sidecar the download's progress is saved to."""
+        return self.path + '.part.json'
+    
+    @property
+    def received(self) -> int:
+        """The amount of bytes downloaded so far, including the bytes resumed
+        from a checkpoint."""
+        return sum(part.done for part in self._parts)
+    
+    # State methods
+    def start(self) -> Future:
+        """Probes the host, then starts downloading the file."""
+        probe = QtNetwork.QNetworkRequest(self._request)
+        probe.setRawHeader(b'Accept-Encoding', b'identity')
+        
+        self._pending = self._factory._submit('HEAD', probe, idle_timeout=self._idle_timeout)
+        self._pending.add_done_callback(self._on_probed)
+        
+        return self.future
+    
+    # Internal methods
+    def _on_probed(self, future: Future):
+        """Starts the parts once the host has described the file."""
+        self._pending = None
+        response: Response = future._result
+        
+        if self._finished:
+            return
+        
+        if self.future.cancelled():
+            self._resolve(response)
+            
+            return
+        
+        headers = response.headers
+        ranges = [unit.strip().lower() for unit in headers.get('Accept-Ranges', '').split(',')]
+        length = headers.get('Content-Length', '')
+        
+        if not response.is_okay() or 'bytes' not in ranges or not length.isdigit() or int(length) <= 0 \
+                or headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            self._fall_back()
+            
+            return
+        
+        self._probe = response
+        self._length = int(length)
+        
+        try:
+            self._open()
+        
+        except IOError as e:
+            self._fail(exception=e)
+            
+            return
+        
+        self._emit_progress()
+        
+        for part in self._parts:
+            if part.remaining > 0:
+                self._send(part)
+        
+        if all(part.remaining <= 0 for part in self._parts):
+            self._complete()
+        
+        else:
+            self._timer.start(self.CHECKPOINT_INTERVAL)
+    
+    def _fall_back(self):
+        """Downloads the file through a single request, since the host can't
+        send it in parts."""
+        file = QtCore.QSaveFile(self.path)
+        
+        if not file.open(QtCore.QIODevice.WriteOnly):
+            self._fail(exception=IOError(f'Could not open "{self.path}" for writing! ({file.errorString()})'))
+            
+            return
+        
+        self._discard()
+        
+        self._pending = self._factory._save(self._request, self.path, file, idle_timeout=self._idle_timeout)
+        self._pending.progress.connect(self.future.progress)
+        self._pending.add_done_callback(self._on_fell_back)
+    
+    def _on_fell_back(self, future: Future):
+        """Resolves the download with the fallback request's result."""
+        self._pending = None
+        
+        if future._exception is not None:
+            self._fail(exception=future._exception)
+        
+        else:
+            self._resolve(future._result)
+    
+    def _open(self):
+        """Opens the part file, and splits the file into parts.  Parts are
+        resumed from the checkpoint if it's still valid.
+        
+        :raises IOError: The part file couldn't be opened or preallocated."""
+        checkpoint = self._load_checkpoint() if self._resume else None
+        
+        self._file = QtCore.QFile(self.part_path)
+        
+        if not self._file.open(QtCore.QIODevice.ReadWrite):
+            raise IOError(f'Could not open "{self.part_path}" for writing! ({self._file.errorString()})')
+        
+        if checkpoint is None or self._file.size() != self._length:
+            checkpoint = None
+            
+            # Sparse files are preallocated without writing their contents
+            if not self._file.resize(0) or not self._file.resize(self._length):
+                raise IOError(f'Could not preallocate "{self.part_path}"! ({self._file.errorString()})')
+        
+        if checkpoint is not None:
+            self._parts = [_Part(self._file, start, stop, done) for start, stop, done in checkpoint['parts']]
+            
+            return
+        
+        count = max(1, min(self._parts_wanted, self._length // self.MIN_PART_SIZE))
+        size = -(-self._length // count)
+        
+        self._parts = [_Part(self._file, start, min(start + size, self._length))
+                       for start in range(0, self._length, size)]
+    
+    def _validators(self) -> typing.Dict[str, str]:
+        """Returns the fields that identify the version of the file the parts
+        were downloaded from."""
+        headers = self._probe.headers
+        
+        return {
+            'url': self._request.url().toString(),
+            'length': self._length,
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', '')
+        }
+    
+    def _load_checkpoint(self) -> typing.Optional[dict]:
+        """Returns the download's checkpoint, or None if it's missing or was
+        made for another version of the file."""
+        try:
+            with open(self.checkpoint_path, encoding='UTF-8') as file:
+                checkpoint = json.load(file)
+        
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(checkpoint, dict) or any(checkpoint.get(k) != v for k, v in self._validators().items()):
+            return None
+        
+        parts = checkpoint.get('parts')
+        
+        if not isinstance(parts, list) or not all(isinstance(p, list) and len(p) == 3 for p in parts):
+            return None
+        
+        return checkpoint
+    
+    def _checkpoint(self):
+        """Saves the download's progress into its sidecar.  The part file is
+        flushed first, so the checkpoint never claims bytes that weren't
+        written."""
+        if self._file is None or not self._file.flush():
+            return
+        
+        checkpoint = self._validators()
+        checkpoint['parts'] = [[part.start, part.stop, part.done] for part in self._parts]
+        
+        file = QtCore.QSaveFile(self.checkpoint_path)
+        
+        if file.open(QtCore.QIODevice.WriteOnly):
+            file.write(json.dumps(checkpoint).encode(encoding='UTF-8'))
+            file.commit()
+    
+    def _discard(self):
+        """Removes the part file and the checkpoint."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        
+        for path in (self.part_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _send(self, part: _Part):
+        """Requests the remainder of a part."""
+        request = QtNetwork.QNetworkRequest(self._request)
+        request.setRawHeader(b'Range', f'bytes={part.start + part.done}-{part.stop - 1}'.encode())
+        request.setRawHeader(b'Accept-Encoding', b'identity')
+        
+        # The host sends the whole file instead of a range if it changed
+        validator = self._probe.headers.get('ETag', '')
+        
+        if not validator or validator.startswith('W/'):
+            validator = self._probe.headers.get('Last-Modified', '')
+        
+        if validator:
+            request.setRawHeader(b'If-Range', validator.encode(encoding='UTF-8'))
+        
+        part.attempt += 1
+        part.future = self._factory._submit('GET', request, sink=part, idle_timeout=self._idle_timeout)
+        part.future.progress.connect(lambda *_: self._emit_progress())
+        part.future.add_done_callback(functools.partial(self._on_part_done, part))
+    
+    def _on_part_done(self, part: _Part, future: Future):
+        """Handles a finished part request, retrying it if the factory's retry
+        policy allows."""
+        part.future = None
+        response: Response = future._result
+        
+        if self._finished:
+            return
+        
+        if part.error:
+            self._fail(exception=IOError(f'Could not write to "{self.part_path}"! ({part.error})'))
+        
+        elif response.is_okay() and response.status == 200:
+            # The file changed since the probe, so the parts can't be stitched
+            self._fail(response, discard=True)
+        
+        elif response.is_okay() and part.remaining <= 0:
+            # Parts may receive their last byte before their request resolves
+            if all(p.remaining <= 0 and p.future is None for p in self._parts):
+                self._complete()
+        
+        elif self.future.cancelled():
+            self._fail(response)
+        
+        else:
+            policy = self._factory.retry
+            
+            # Parts are requested again from where they stopped
+            if policy is not None and part.attempt < policy.max_attempts and \
+                    (response.is_okay() or policy.should_retry('GET', response, part.attempt)):
+                delay = policy.delay(part.attempt, response)
+                QtCore.QTimer.singleShot(int(delay * 1000), functools.partial(self._retry, part, response))
+            
+            elif response.is_okay():
+                self._fail(exception=IOError(f'The host ended bytes {part.start}-{part.stop - 1} early!'))
+            
+            else:
+                self._fail(response)
+    
+    def _retry(self, part: _Part, response: Response):
+        """Requests the remainder of a part again, unless the download was
+        resolved in the meantime."""
+        if self._finished:
+            return
+        
+        if self.future.cancelled():
+            self._fail(response)
+        
+        else:
+            self._send(part)
+    
+    def _emit_progress(self):
+        """Reports the download's progress through its future."""
+        self.future.progress.emit(self.received, self._length)
+    
+    def _complete(self):
+        """Replaces the file at `path` with the finished part file."""
+        self._finished = True
+        self._timer.stop()
+        self._file.close()
+        self._file = None
+        
+        try:
+            os.replace(self.part_path, self.path)
+        
+        except OSError as e:
+            self._fail(exception=IOError(f'Could not save "{self.path}"! ({e})'))
+            
+            return
+        
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        
+        self._probe.bytes_received = self._length
+        self._probe.timings.finished = time.monotonic()
+        self._resolve(self._probe)
+    
+    def _cancel(self):
+        """Cancels every request the download has in flight.  The download is
+        resolved once they've finished, or once a part waiting to be retried
+        notices."""
+        if self._pending is not None:
+            self._pending.cancel()
+        
+        for part in self._parts:
+            if part.future is not None:
+                part.future.cancel()
+    
+    def _fail(self, response: Response = None, *, exception: BaseException = None, discard: bool = False):
+        """Resolves the download without replacing the file.  The progress is
+        checkpointed so the download can be resumed, unless `discard` is
+        True."""
+        self._finished = True
+        self._timer.stop()
+        
+        for part in self._parts:
+            if part.future is not None:
+                part.future.cancel()
+        
+        if discard:
+            self._discard()
+        
+        elif self._file is not None:
+            self._checkpoint()
+            self._file.close()
+            self._file = None
+        
+        if exception is not None:
+            self.future._set_exception(exception)
+            self.deleteLater()
+        
+        else:
+            self._resolve(response)
+    
+    def _resolve(self, response: Response):
+        """Resolves the download's future, and releases the download."""
+        self._finished = True
+        self.future._set_result(response)
+        self.deleteLater()
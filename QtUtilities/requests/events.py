@@ -0,0 +1,416 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import asyncio
+import codecs
+import dataclasses
+import functools
+import json
+import re
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+from .future import Future
+from .response import Response
+
+if typing.TYPE_CHECKING:
+    from .factory import Factory
+
+__all__ = ['Event', 'EventParser', 'EventSource']
+
+_LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+
+@dataclasses.dataclass(frozen=True)
+class Event:
+    """An event received from a `text/event-stream`."""
+    type: str = 'message'
+    data: str = ''
+    id: str = ''
+    
+    def json(self) -> typing.Any:
+        """Converts the event's data into a JSON object."""
+        return json.loads(self.data)
+
+
+class EventParser:
+    """Incrementally parses the chunks of a `text/event-stream` into events,
+    as described by the HTML standard."""
+    
+    def __init__(self):
+        # Public attributes
+        self.last_event_id = ''
+        self.retry: typing.Optional[int] = None  # The reconnection time the host asked for, in milliseconds
+        
+        # Private attributes
+        self._decoder = codecs.getincrementaldecoder('UTF-8')(errors='replace')
+        self._pending = ''
+        self._started = False
+        self._after_cr = False
+        self._type = ''
+        self._data: typing.List[str] = []
+    
+    # Parser methods
+    def feed(self, chunk: bytes) -> typing.List[Event]:
+        """Parses a chunk of the stream, and returns the events it completed."""
+        text = self._decoder.decode(chunk)
+        
+        if not self._started and text:
+            self._started = True
+            text = text[1:] if text.startswith('\ufeff') else text
+        
+        # A CRLF may be split between chunks
+        if self._after_cr and text.startswith('\n'):
+            text = text[1:]
+        
+        if text:
+            self._after_cr = text.endswith('\r')
+        
+        lines = _LINE_BREAK.split(self._pending + text)
+        self._pending = lines.pop()
+        events = []
+        
+        for line in lines:
+            event = self._parse_line(line)
+            
+            if event is not None:
+                events.append(event)
+        
+        return events
+    
+    def reset(self):
+        """Discards the event being parsed, for when the stream is reconnected.
+        The last event id is kept."""
+        self._decoder.reset()
+        self._pending = ''
+        self._started = False
+        self._after_cr = False
+        self._type = ''
+        self._data.clear()
+    
+    # Internal methods
+    def _parse_line(self, line: str) -> typing.Optional[Event]:
+        """Processes a line of the stream, and returns the event it completed,
+        if any."""
+        if not line:
+            return self._dispatch()
+        
+        if line.startswith(':'):
+            return None
+        
+        field, _, value = line.partition(':')
+        value = value[1:] if value.startswith(' ') else value
+        
+        if field == 'event':
+            self._type = value
+        
+        elif field == 'data':
+            self._data.append(value)
+        
+        elif field == 'id' and '\0' not in value:
+            self.last_event_id = value
+        
+        elif field == 'retry' and value.isascii() and value.isdigit():
+            self.retry = int(value)
+        
+        return None
+    
+    def _dispatch(self) -> typing.Optional[Event]:
+        """Completes the event being parsed.  Events without data aren't
+        dispatched."""
+        event_type, data = self._type, self._data
+        self._type, self._data = '', []
+        
+        if not data:
+            return None
+        
+        return Event(event_type or 'message', '\n'.join(data), self.last_event_id)
+
+
+class _Inbox(QtCore.QObject):
+    """Hands an event source's signals to an asyncio queue on the thread that
+    created the inbox."""
+    
+    def __init__(self, events: asyncio.Queue):
+        # Super call
+        super(_Inbox, self).__init__()
+        
+        # Private attributes
+        self._events = events
+    
+    @QtCore.pyqtSlot(object)
+    def put(self, event: Event):
+        self._events.put_nowait(event)
+    
+    @QtCore.pyqtSlot()
+    def close(self):
+        self._events.put_nowait(None)
+
+
+class EventSource(QtCore.QObject):
+    """A Server-Sent Events stream, kept open through a factory.
+    
+    Events are parsed from the reply as they arrive, and are emitted through
+    `event_received`, or can be iterated over with `async for`.  If the
+    connection drops, the source reconnects with a `Last-Event-ID` header
+    after `reconnect_delay` milliseconds, or after the delay the host asked
+    for, doubling the delay after every failed attempt up to
+    `max_reconnect_delay`.  Responses other than `200 OK` with a
+    `text/event-stream` body close the source for good, like they would in
+    a browser.
+    
+    If `idle_timeout` is passed, connections that haven't received anything,
+    including comments the host sends as heartbeats, for `idle_timeout`
+    milliseconds are reconnected.
+    
+    Sources live on their factory's thread.  Like a Future's, their signals
+    invoke slots connected from other threads on those threads.  Events
+    received before an `async for` loop starts aren't replayed to it."""
+    CONNECTING, OPEN, CLOSED = range(3)
+    
+    opened = QtCore.pyqtSignal()  # Emitted whenever a connection is established.
+    event_received = QtCore.pyqtSignal(object)  # Emitted with each Event received.
+    error = QtCore.pyqtSignal(int, str)  # Emitted with the error code and message of a failed connection.
+    closed = QtCore.pyqtSignal()  # Emitted once the source stops reconnecting.
+    
+    def __init__(self, factory: 'Factory', request: QtNetwork.QNetworkRequest, *, reconnect_delay: int = 3000,
+                 max_reconnect_delay: int = 60000, idle_timeout: int = None, last_event_id: str = '',
+                 parent: QtCore.QObject = None):
+        # Super call
+        super(EventSource, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        
+        # Private attributes
+        self._factory = factory
+        self._request = request
+        self._idle_timeout = idle_timeout
+        self._parser = EventParser()
+        self._state = self.CONNECTING
+        self._failures = 0
+        self._future: typing.Optional[Future] = None
+        self._response: typing.Optional[Response] = None
+        self._timer = QtCore.QTimer(self)
+        
+        self._parser.last_event_id = last_event_id
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._connect)
+    
+    # Properties
+    @property
+    def state(self) -> int:
+        """Whether the source is CONNECTING, OPEN, or CLOSED."""
+        return self._state
+    
+    @property
+    def url(self) -> QtCore.QUrl:
+        """The url of the stream."""
+        return self._request.url()
+    
+    @property
+    def last_event_id(self) -> str:
+        """The id of the last event received, which is sent to the host when
+        the source reconnects."""
+        return self._parser.last_event_id
+    
+    # State methods
+    def open(self):
+        """Connects to the stream."""
+        self._factory._marshal(self._connect)
+    
+    def close(self):
+        """Closes the stream, and stops reconnecting."""
+        self._factory._marshal(self._close)
+    
+    # Internal methods
+    def _connect(self):
+        """Sends the request for the stream."""
+        if self._state == self.CLOSED:
+            return
+        
+        request = QtNetwork.QNetworkRequest(self._request)
+        request.setRawHeader(b'Accept', b'text/event-stream')
+        request.setRawHeader(b'Cache-Control', b'no-cache')
+        request.setAttribute(QtNetwork.QNetworkRequest.CacheLoadControlAttribute,
+                             QtNetwork.QNetworkRequest.AlwaysNetwork)
+        
+        if self._parser.last_event_id:
+            request.setRawHeader(b'Last-Event-ID', self._parser.last_event_id.encode(encoding='UTF-8'))
+        
+        self._state = self.CONNECTING
+        self._parser.reset()
+        
+        self._future = self._factory._submit('GET', request, stream=True, idle_timeout=self._idle_timeout or 0)
+        self._future.add_done_callback(self._on_connected)
+    
+    def _on_connected(self, future: Future):
+        """Validates the host's response, then starts reading events from it."""
+        self._future = None
+        response: Response = future._result
+        reply = response._reply
+        
+        if self._state == self.CLOSED:
+            response.close()
+            
+            return
+        
+        status = reply.attribute(QtNetwork.QNetworkRequest.HttpStatusCodeAttribute) if reply is not None else None
+        
+        if not status:
+            # The host couldn't be reached
+            self._disconnect(response)
+            
+            return
+        
+        content_type = response.headers.get('Content-Type', '').partition(';')[0].strip().lower()
+        
+        if status != 200 or content_type != 'text/event-stream':
+            # Qt reports error statuses after their headers, and complains if
+            # the reply is aborted in between.
+            QtCore.QTimer.singleShot(0, lambda: response.close())
+            
+            if status != 204:
+                self.error.emit(response.code or QtNetwork.QNetworkReply.ProtocolFailure,
+                                f'Expected an event stream, got a {status} response of "{content_type}"')
+            
+            self._close()
+            
+            return
+        
+        self._response = response
+        self._state = self.OPEN
+        self._failures = 0
+        
+        reply.readyRead.connect(self._read)
+        reply.finished.connect(functools.partial(self._disconnect, response))
+        
+        self.opened.emit()
+        self._read()
+        
+        if reply.isFinished():
+            self._disconnect(response)
+    
+    def _read(self):
+        """Parses the data the reply has received, and emits its events."""
+        response = self._response
+        
+        # Aborted replies are closed, so there's nothing left to read
+        if response is None or response._reply is None or not response._reply.isOpen():
+            return
+        
+        for event in self._parser.feed(response._decode(response._reply.readAll().data())):
+            self.event_received.emit(event)
+            
+            # Slots may close the source
+            if self._response is not response:
+                return
+        
+        if self._parser.retry is not None:
+            self.reconnect_delay = self._parser.retry
+    
+    def _disconnect(self, response: Response):
+        """Reconnects to the stream after its connection dropped."""
+        if self._response is response:
+            self._read()
+            self._response = None
+        
+        response.close()
+        
+        if self._state == self.CLOSED:
+            return
+        
+        if not response.is_okay() and response.code != QtNetwork.QNetworkReply.OperationCanceledError:
+            self.error.emit(response.code, response.error_string)
+        
+        self._state = self.CONNECTING
+        self._failures += 1
+        self._timer.start(min(self.max_reconnect_delay, self.reconnect_delay * 2 ** (self._failures - 1)))
+    
+    def _close(self):
+        """The real implementation of `close`."""
+        if self._state == self.CLOSED:
+            return
+        
+        self._state = self.CLOSED
+        self._timer.stop()
+        
+        if self._future is not None:
+            self._future.cancel()
+        
+        if self._response is not None:
+            response, self._response = self._response, None
+            response.close()
+        
+        self.closed.emit()
+        
+        # Closed sources are no longer kept alive by the factory
+        self.setParent(None)
+    
+    # Magic methods
+    async def __aiter__(self) -> typing.AsyncIterator[Event]:
+        """Yields events as they're received, until the source is closed."""
+        # Declarations
+        events: asyncio.Queue = asyncio.Queue()
+        inbox = _Inbox(events)
+        
+        self.event_received.connect(inbox.put)
+        self.closed.connect(inbox.close)
+        
+        try:
+            if self._state == self.CLOSED:
+                return
+            
+            while True:
+                event = await events.get()
+                
+                if event is None:
+                    return
+                
+                yield event
+        
+        finally:
+            self.event_received.disconnect(inbox.put)
+            self.closed.disconnect(inbox.close)
+            inbox.deleteLater()
+    
+    def __enter__(self) -> 'EventSource':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    async def __aenter__(self) -> 'EventSource':
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __repr__(self):
+        state = ('connecting', 'open', 'closed')[self._state]
+        
+        return f'<{self.__class__.__name__} url="{self.url.toDisplayString()}" state={state}>'
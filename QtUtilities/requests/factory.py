@@ -24,117 +24,1167 @@
 # with QtUtilities.  If not,
 # see <https://www.gnu.org/licenses/>.
 import functools
+import queue
+import time
 import typing
 
 from PyQt5 import QtCore, QtNetwork
 
+from .batch import Batch, Request
+from .bodies import FileDevice, IteratorDevice
+from .cache import DiskCache, MemoryCache, fingerprint
+from .compression import Compression
+from .downloads import RangedDownload
+from .events import EventSource
+from .future import CancelToken, Future
+from .limits import RateLimiter
+from .metrics import Metrics
+from .pagination import LinkPagination, Pagination
+from .prepared import PreparedRequest, _encode, _with_query
 from .response import Response
+from .retry import RetryPolicy
+from .transport import ManagerTransport, Transport
 
 __all__ = ['Factory']
 
+_FINISHED = object()  # Put into an `as_completed` queue once its batch finishes
+
+# The request attributes that change which reply a request receives, so
+# requests that differ in them can't share a reply.
+_COALESCED_ATTRIBUTES = (
+    QtNetwork.QNetworkRequest.CacheLoadControlAttribute,
+    QtNetwork.QNetworkRequest.CacheSaveControlAttribute,
+    QtNetwork.QNetworkRequest.FollowRedirectsAttribute,
+    QtNetwork.QNetworkRequest.RedirectPolicyAttribute,
+    QtNetwork.QNetworkRequest.CookieLoadControlAttribute,
+    QtNetwork.QNetworkRequest.CookieSaveControlAttribute,
+    QtNetwork.QNetworkRequest.AuthenticationReuseAttribute,
+    QtNetwork.QNetworkRequest.User
+)
+
 
 class Factory(QtCore.QObject):
     """The core of the requests package.
     
     This class is responsible for issuing requests through the application's
-    QNetworkAccessManager, and returning the response in a synchronous way."""
+    QNetworkAccessManager, and returning the response in a synchronous way.
+    Requests can also be issued asynchronously through `submit`, which returns
+    a Future instead of waiting on a nested event loop.
+    
+    If `asynchronous` is True, the method aliases (`get`, `post`, etc.) will
+    return Futures, allowing `await factory.get(url)` from coroutines running
+    on a `QtUtilities.aio.QtEventLoop`.
+    
+    If `memory_cache` is passed, successful GET and HEAD responses will be
+    answered from it without touching the manager while they're fresh.
+    
+    If `coalesce` is True, identical GET and HEAD requests issued while one is
+    still in flight will share its reply instead of sending their own.  Each
+    caller still receives its own Response, and its own `timeout` applies.
+    Only requests with the same `idle_timeout` and request attributes, such as
+    their cache and redirect settings, share a reply.
+    
+    If `retry` is passed, failed requests will be sent again as the policy
+    allows, with the backoff between attempts waited on a Qt timer.
+    
+    If `rate_limiter` is passed, every attempt waits for a token from it before
+    being sent.
+    
+    If `compression` is passed, large request bodies will be compressed, and
+    responses will be requested in the best encoding available.
     
-    def __init__(self, manager: QtNetwork.QNetworkAccessManager = None, *, parent: QtCore.QObject = None):
+    Every response the factory receives is recorded in `metrics`, which can be
+    shared between factories by passing the same Metrics object.
+    
+    If `transport` is passed, requests will be sent through it instead of the
+    manager, which allows them to be served without a network.
+    
+    `timeout` and `idle_timeout` are the default timeouts of every request, in
+    milliseconds.  See `request` for what they limit.
+    
+    If `threaded` is True, the factory and its manager will live on a worker
+    thread of their own, so replies are processed off of the thread that
+    issued them.  Requests can then be issued from any thread, including plain
+    Python threads, and are resolved through their futures.  Threaded
+    factories can't have a parent, and should be closed with `close` once
+    they're no longer needed."""
+    _invoke = QtCore.pyqtSignal(object)  # Emitted with a callable to invoke on the factory's thread.
+    
+    STREAM_BUFFER_SIZE = 1024 * 1024  # The maximum amount of bytes buffered for streamed responses.
+    SPOOL_CHUNK_SIZE = 64 * 1024  # The amount of bytes copied at a time when spooling request bodies to disk.
+    
+    def __init__(self, manager: QtNetwork.QNetworkAccessManager = None, *, parent: QtCore.QObject = None,
+                 asynchronous: bool = False, memory_cache: MemoryCache = None, coalesce: bool = True,
+                 retry: RetryPolicy = None, rate_limiter: RateLimiter = None, compression: Compression = None,
+                 metrics: Metrics = None, timeout: int = None, idle_timeout: int = None, threaded: bool = False,
+                 transport: Transport = None):
         # Super call
         super(Factory, self).__init__(parent=parent)
         
+        # Declarations
+        method = self.submit if asynchronous else self.request
+        
         # Aliases
-        self.get = functools.partial(self.request, 'GET')
-        self.put = functools.partial(self.request, 'PUT')
-        self.post = functools.partial(self.request, 'POST')
-        self.head = functools.partial(self.request, 'HEAD')
-        self.patch = functools.partial(self.request, 'PATCH')
-        self.delete = functools.partial(self.request, 'DELETE')
-        self.options = functools.partial(self.request, 'OPTIONS')
+        self.get = functools.partial(method, 'GET')
+        self.put = functools.partial(method, 'PUT')
+        self.post = functools.partial(method, 'POST')
+        self.head = functools.partial(method, 'HEAD')
+        self.patch = functools.partial(method, 'PATCH')
+        self.delete = functools.partial(method, 'DELETE')
+        self.options = functools.partial(method, 'OPTIONS')
+        
+        # Public attributes
+        self.memory_cache = memory_cache
+        self.coalesce = coalesce
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.compression = compression
+        self.metrics = metrics
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.transport = transport
         
         # Private attributes
         self._manager = manager
+        self._asynchronous = asynchronous
+        self._in_flight: typing.Dict[tuple, list] = {}  # Maps request keys to their shared future and follower count
+        self._thread: typing.Optional[QtCore.QThread] = None
         
         # Attribute validation
         if self._manager is None:
             self._manager = QtNetwork.QNetworkAccessManager(parent=self)
+        
+        if self.metrics is None:
+            self.metrics = Metrics()
+        
+        if self.transport is None:
+            self.transport = ManagerTransport(self._manager, parent=self)
+        
+        # Signal mapping
+        self._invoke.connect(self._run)
+        
+        # Thread creation
+        if threaded:
+            if parent is not None:
+                raise ValueError('Threaded factories cannot have a parent!')
+            
+            self._thread = QtCore.QThread()
+            self._thread.setObjectName(f'{self.__class__.__name__}Thread')
+            
+            self.moveToThread(self._thread)
+            self._adopt(self._manager)
+            self._adopt(self.rate_limiter)
+            self._adopt(self.transport)
+            
+            self._thread.start()
+    
+    # Thread methods
+    def close(self):
+        """Stops the factory's worker thread, if it has one.  The factory is
+        moved back to the application's main thread, so it can still be used
+        afterwards."""
+        if self._thread is None:
+            return
+        
+        main = QtCore.QCoreApplication.instance().thread()
+        self._call(lambda: self._move_to(main))
+        
+        self._thread.quit()
+        self._thread.wait()
+        self._thread = None
+    
+    def _move_to(self, thread: QtCore.QThread):
+        """Moves the factory, and the objects it uses, to another thread.
+        This must be called from the factory's thread."""
+        self.moveToThread(thread)
+        self._adopt(self._manager)
+        self._adopt(self.rate_limiter)
+        self._adopt(self.transport)
+    
+    def _adopt(self, obj: typing.Optional[QtCore.QObject]):
+        """Moves an object the factory uses onto the factory's thread.
+        
+        :raises ValueError: The object is owned by another thread's object."""
+        if obj is None or obj.thread() is self.thread():
+            return
+        
+        if obj.parent() is not None and obj.parent() is not self:
+            raise ValueError(f'{obj!r} has a parent, so it cannot be moved onto the factory\'s thread!')
+        
+        obj.moveToThread(self.thread())
+    
+    def _is_local(self) -> bool:
+        """Whether or not the current thread is the factory's thread."""
+        return QtCore.QThread.currentThread() is self.thread()
+    
+    @QtCore.pyqtSlot(object)
+    def _run(self, func: typing.Callable[[], None]):
+        """Invokes a callable posted to the factory's thread."""
+        func()
     
-    # Core request method
+    def _marshal(self, func: typing.Callable[[], typing.Any]) -> Future:
+        """Invokes `func` on the factory's thread, and returns a future for
+        what it returns.  If `func` returns a future, the returned future
+        mirrors it."""
+        if self._is_local():
+            result = func()
+            
+            if isinstance(result, Future):
+                return result
+            
+            proxy = Future()
+            proxy._set_result(result)
+            
+            return proxy
+        
+        proxy = Future()
+        self._invoke.emit(functools.partial(self._mirror, proxy, func))
+        
+        return proxy
+    
+    def _mirror(self, proxy: Future, func: typing.Callable[[], typing.Any]):
+        """Invokes `func` on behalf of a future issued from another thread."""
+        try:
+            result = func()
+        
+        except Exception as e:
+            proxy._set_exception(e)
+            
+            return
+        
+        if not isinstance(result, Future):
+            proxy._set_result(result)
+            
+            return
+        
+        # The canceller is set before the flag is checked, so a cancellation
+        # from the other thread is never missed.
+        result.progress.connect(proxy.progress)
+        result.add_done_callback(functools.partial(self._forward, proxy))
+        proxy._canceller = functools.partial(self._invoke.emit, result.cancel)
+        
+        if proxy.cancelled():
+            result.cancel()
+    
+    def _call(self, func: typing.Callable[[], typing.Any]) -> typing.Any:
+        """Invokes `func` on the factory's thread, and waits for its result."""
+        if self._is_local():
+            return func()
+        
+        return self._marshal(func).result()
+    
+    # Cache methods
+    def set_disk_cache(self, directory: typing.Optional[str], *, max_size: int = None) -> typing.Optional[DiskCache]:
+        """Stores responses in a persistent HTTP cache within `directory`.
+        
+        Cached responses are revalidated with `If-None-Match` and
+        `If-Modified-Since` once they're stale, and the least recently used
+        entries are evicted once the cache exceeds `max_size` bytes.  Passing
+        None as the directory disables the cache.
+        
+        :returns DiskCache: The cache the factory's manager now uses."""
+        return self._call(functools.partial(self._set_disk_cache, directory, max_size=max_size))
+    
+    def _set_disk_cache(self, directory: typing.Optional[str], *, max_size: int = None) -> typing.Optional[DiskCache]:
+        """The real implementation of the set_disk_cache method."""
+        if directory is None:
+            # noinspection PyTypeChecker
+            self._manager.setCache(None)
+            
+            return None
+        
+        cache = DiskCache(directory, max_size=max_size)
+        self._manager.setCache(cache)  # The manager takes ownership of the cache
+        
+        return cache
+    
+    # Core request methods
     def request(self, op: str, url: typing.Union[QtCore.QUrl, str], *,
                 params: typing.Dict[str, str] = None,
                 headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
-                data: typing.Union[str, bytes, QtCore.QBuffer] = None,
-                request: QtNetwork.QNetworkRequest = None):
+                data: typing.Union[str, bytes, typing.BinaryIO, typing.Iterable[bytes], QtCore.QIODevice,
+                                   QtNetwork.QHttpMultiPart] = None,
+                request: QtNetwork.QNetworkRequest = None,
+                stream: bool = False,
+                timeout: int = None,
+                idle_timeout: int = None,
+                cancel_token: CancelToken = None) -> Response:
         """Issues a new request.
         
         This method was designed to mimic standard synchronous libraries on PyPi,
         but on the Qt5 event loop.
         
-        If request is passed, `url`, `params`, and `headers` will be ignored."""
+        If request is passed, `url`, `params`, and `headers` will be ignored.
+        
+        `data` may be a str, bytes, an open binary file, a QIODevice, a
+        QHttpMultiPart (see `Multipart`), or an iterator of chunks.  Files,
+        devices, and iterators are read as the request is sent instead of
+        being loaded into memory.  Iterators are only sent as they're
+        produced if a Content-Length header is passed; otherwise they're
+        spooled to a temporary file first.
+        
+        If stream is True, this method will return as soon as the response's
+        headers arrive, and the body can be read with `Response.iter_content`.
+        Streamed bodies are read straight from their reply, so they must be
+        requested from the factory's thread; threaded factories can write
+        bodies to disk with `download` instead.
+        
+        If `timeout` is passed, the request will be cancelled if it doesn't
+        finish within `timeout` milliseconds, including any retries.  If
+        `idle_timeout` is passed, an attempt will be aborted once it hasn't sent
+        or received anything for `idle_timeout` milliseconds.  Either way, the
+        response's `timed_out` attribute will be True and its code will be
+        `QNetworkReply.TimeoutError`.  The factory's timeouts are used when
+        these aren't passed, and 0 disables them.
+        
+        If `cancel_token` is passed, the request will be cancelled when the
+        token is.
+        
+        :raises ValueError: A streamed request was issued from another thread
+        than the factory's."""
+        return self.submit(op, url, params=params, headers=headers, data=data, request=request, stream=stream,
+                           timeout=timeout, idle_timeout=idle_timeout, cancel_token=cancel_token).result()
+    
+    def submit(self, op: str, url: typing.Union[QtCore.QUrl, str], *,
+               params: typing.Dict[str, str] = None,
+               headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+               data: typing.Union[str, bytes, typing.BinaryIO, typing.Iterable[bytes], QtCore.QIODevice,
+                                  QtNetwork.QHttpMultiPart] = None,
+               request: QtNetwork.QNetworkRequest = None,
+               stream: bool = False,
+               timeout: int = None,
+               idle_timeout: int = None,
+               cancel_token: CancelToken = None) -> Future:
+        """Issues a new request without waiting for it to finish.
+        
+        The returned future will be resolved with a Response object once the
+        underlying QNetworkReply finishes, or once the response's headers arrive
+        if stream is True.
+        
+        If request is passed, `url`, `params`, and `headers` will be ignored.
+        See `request` for the accepted data and the timeouts.
+        
+        :raises ValueError: A streamed request was issued from another thread
+        than the factory's."""
+        # QIODevices aren't thread-safe, so replies can only be read on the
+        # factory's thread.
+        if stream and not self._is_local():
+            raise ValueError('Streamed requests must be issued from the factory\'s thread!')
+        
+        future = self._marshal(functools.partial(self._issue, op, url, params=params, headers=headers, data=data,
+                                                 request=request, stream=stream, timeout=timeout,
+                                                 idle_timeout=idle_timeout))
+        
+        if cancel_token is not None:
+            cancel_token._register(future)
+        
+        return future
+    
+    # Event stream methods
+    def events(self, url: typing.Union[QtCore.QUrl, str], *,
+               params: typing.Dict[str, str] = None,
+               headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+               reconnect_delay: int = 3000,
+               idle_timeout: int = None,
+               last_event_id: str = '') -> EventSource:
+        """Opens a Server-Sent Events stream at `url`.
+        
+        The returned EventSource emits the events it receives, can be iterated
+        over with `async for`, and reconnects until it's closed.  The factory's
+        timeouts don't apply to streams; see EventSource for `idle_timeout`."""
+        return self._call(functools.partial(self._events, url, params=params, headers=headers,
+                                            reconnect_delay=reconnect_delay, idle_timeout=idle_timeout,
+                                            last_event_id=last_event_id))
+    
+    def _events(self, url: typing.Union[QtCore.QUrl, str], *,
+                params: typing.Dict[str, str] = None,
+                headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                reconnect_delay: int = 3000,
+                idle_timeout: int = None,
+                last_event_id: str = '') -> EventSource:
+        """Opens an event stream on the factory's thread."""
+        request, _ = self._prepare(url, params=params, headers=headers)
+        source = EventSource(self, request, reconnect_delay=reconnect_delay, idle_timeout=idle_timeout,
+                             last_event_id=last_event_id, parent=self)
+        source.open()
+        
+        return source
+    
+    # Prepared request methods
+    @staticmethod
+    def prepare(op: str, url: typing.Union[QtCore.QUrl, str], *,
+                params: typing.Dict[str, str] = None,
+                headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None) -> PreparedRequest:
+        """Encodes a request's url, params, and headers once, so it can be sent
+        many times through `send`."""
+        return PreparedRequest(op, url, params=params, headers=headers)
+    
+    def send(self, prepared: PreparedRequest, *,
+             params: typing.Dict[str, str] = None,
+             headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+             data: typing.Union[str, bytes, typing.BinaryIO, typing.Iterable[bytes], QtCore.QIODevice,
+                                QtNetwork.QHttpMultiPart] = None,
+             stream: bool = False,
+             timeout: int = None,
+             idle_timeout: int = None,
+             cancel_token: CancelToken = None) -> typing.Union[Response, Future]:
+        """Sends a prepared request.  `params` and `headers` override the
+        prepared request's for this request only.
+        
+        Like the method aliases, this returns a Future if the factory is
+        asynchronous, and waits for the Response otherwise.  See `request`
+        for the remaining arguments."""
+        request = prepared.build(params=params, headers=headers)
+        future = self.submit(prepared.op, request.url(), data=data, request=request, stream=stream, timeout=timeout,
+                             idle_timeout=idle_timeout, cancel_token=cancel_token)
+        
+        return future if self._asynchronous else future.result()
+    
+    def _issue(self, op: str, url: typing.Union[QtCore.QUrl, str], *,
+               params: typing.Dict[str, str] = None,
+               headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+               data: typing.Any = None,
+               request: QtNetwork.QNetworkRequest = None,
+               stream: bool = False,
+               timeout: int = None,
+               idle_timeout: int = None) -> Future:
+        """Issues a new request on the factory's thread."""
+        request, buffer = self._prepare(url, params=params, headers=headers, data=data, request=request)
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        
+        future = self._submit(op.upper(), request, data=buffer, stream=stream, idle_timeout=idle_timeout)
+        self._watch(future, timeout=self.timeout if timeout is None else timeout)
+        
+        return future
+    
+    # Batch request methods
+    def gather(self, requests: typing.Iterable[typing.Union[Request, tuple, str, QtCore.QUrl]], *,
+               max_in_flight: int = None, max_per_host: int = 6) -> typing.List[Response]:
+        """Issues many requests at once, and waits for all of them to finish.
+        
+        `requests` may contain Request objects, tuples in the same order as
+        Request's fields, or urls to GET.  Qt only opens 6 connections per host,
+        so requests beyond `max_per_host` are queued instead of being sent.
+        
+        :returns list: The responses, in the same order as `requests`."""
+        return self._marshal(functools.partial(self._gather, requests, max_in_flight=max_in_flight,
+                                               max_per_host=max_per_host)).result()
+    
+    def as_completed(self, requests: typing.Iterable[typing.Union[Request, tuple, str, QtCore.QUrl]], *,
+                     max_in_flight: int = None, max_per_host: int = 6) -> typing.Iterator[Response]:
+        """Issues many requests at once, and yields their responses as they
+        finish.  See `gather` for the accepted arguments."""
+        # Declarations
+        ready: queue.Queue = queue.Queue()
+        batch: Batch = self._call(functools.partial(self._start_batch, requests, ready, max_in_flight=max_in_flight,
+                                                    max_per_host=max_per_host))
+        finished = False
+        
+        try:
+            while True:
+                if ready.empty():
+                    self._wait_for_batch(batch, ready)
+                
+                response = ready.get()
+                
+                # The batch may also finish because it was cancelled elsewhere,
+                # in which case the dropped requests never produce a response.
+                if response is _FINISHED:
+                    finished = True
+                    
+                    return
+                
+                yield response
+        
+        finally:
+            self._invoke.emit(functools.partial(self._end_batch, batch, cancel=not finished))
+    
+    def _gather(self, requests: typing.Iterable[typing.Union[Request, tuple, str, QtCore.QUrl]], *,
+                max_in_flight: int = None, max_per_host: int = None) -> Future:
+        """Starts a batch on the factory's thread, and returns a future for its
+        responses."""
+        # Declarations
+        batch = Batch(self, requests, max_in_flight=max_in_flight, max_per_host=max_per_host, parent=self)
+        future = Future()
+        
+        def on_finished():
+            future._set_result(batch.responses)
+            batch.deleteLater()
+        
+        batch.finished.connect(on_finished)
+        batch.start()
+        
+        return future
+    
+    def _start_batch(self, requests: typing.Iterable[typing.Union[Request, tuple, str, QtCore.QUrl]],
+                     ready: queue.Queue, *, max_in_flight: int = None, max_per_host: int = None) -> Batch:
+        """Starts a batch on the factory's thread, which puts its responses into
+        `ready` as they finish."""
+        batch = Batch(self, requests, max_in_flight=max_in_flight, max_per_host=max_per_host, parent=self)
+        
+        batch.response_ready.connect(lambda _, response: ready.put(response))
+        batch.finished.connect(lambda: ready.put(_FINISHED))
+        batch.start()
+        
+        return batch
+    
+    @staticmethod
+    def _wait_for_batch(batch: Batch, ready: queue.Queue):
+        """Waits for the batch to put something into `ready`.  Like
+        `Future.result`, threads with a Qt event dispatcher wait on a nested
+        event loop, so they keep processing events, while other threads block
+        on the queue itself."""
+        if QtCore.QAbstractEventDispatcher.instance() is None:
+            return
+        
+        # Declarations
+        loop = QtCore.QEventLoop()
+        
+        batch.response_ready.connect(loop.quit)
+        batch.finished.connect(loop.quit)
+        
+        try:
+            # The batch may have put something into the queue on another thread
+            # while the signals were being connected.
+            if ready.empty():
+                loop.exec()
+        
+        finally:
+            batch.response_ready.disconnect(loop.quit)
+            batch.finished.disconnect(loop.quit)
+            loop.deleteLater()
+    
+    @staticmethod
+    def _end_batch(batch: Batch, *, cancel: bool):
+        """Releases a batch started by `as_completed`, cancelling it if the
+        iterator was closed early."""
+        if cancel:
+            batch.cancel()
+        
+        batch.deleteLater()
+    
+    # Pagination methods
+    def paginate(self, url: typing.Union[QtCore.QUrl, str], *,
+                 params: typing.Dict[str, str] = None,
+                 headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                 pagination: Pagination = None,
+                 max_pages: int = None,
+                 prefetch: bool = True,
+                 timeout: int = None,
+                 idle_timeout: int = None,
+                 cancel_token: CancelToken = None) -> typing.Iterator[typing.Any]:
+        """Walks a paged endpoint, and yields its records one at a time.
+        
+        `pagination` decides where each page's records are, and where the next
+        page is; it defaults to following `Link: rel=next` headers.  If
+        `prefetch` is True, the next page is requested as soon as the current
+        one arrives, so it downloads while the current page is consumed.  The
+        pending page is cancelled if the iterator is closed early.  See
+        `request` for the timeouts, which apply to each page.
+        
+        :raises IOError: A page couldn't be fetched."""
+        # Declarations
+        pagination = pagination or LinkPagination()
+        url = _with_query(QtCore.QUrl(url), params or {})
+        pages = 0
+        
+        def fetch(page: QtCore.QUrl) -> Future:
+            return self.submit('GET', page, headers=headers, timeout=timeout, idle_timeout=idle_timeout,
+                               cancel_token=cancel_token)
+        
+        url = pagination.first_url(url)
+        pending: typing.Optional[Future] = fetch(url)
+        
+        try:
+            while pending is not None:
+                response: Response = pending.result()
+                pending = None
+                pages += 1
+                
+                if not response.is_okay():
+                    raise IOError(f'Could not fetch page {pages} ({response.url.toDisplayString()})! '
+                                  f'({response.error_string})')
+                
+                records = pagination.records(response)
+                next_url = None if max_pages is not None and pages >= max_pages else \
+                    pagination.next_url(url, response, records)
+                
+                if next_url is not None and prefetch:
+                    pending = fetch(next_url)
+                
+                yield from records
+                
+                if next_url is not None and not prefetch:
+                    pending = fetch(next_url)
+                
+                url = next_url
+        
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    def _prepare(self, url: typing.Union[QtCore.QUrl, str], *,
+                 params: typing.Dict[str, str] = None,
+                 headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                 data: typing.Any = None,
+                 request: QtNetwork.QNetworkRequest = None
+                 ) -> typing.Tuple[QtNetwork.QNetworkRequest, typing.Any]:
+        """Converts the arguments passed to `request` into a QNetworkRequest
+        and an optional QIODevice or QHttpMultiPart."""
+        # Data conversion
+        buffer = self._prepare_data(data)
+        
         # Request object validation
         if request is not None:
-            return self._request(op.upper(), request, data=data)
+            return self._prepare_upload(*self._compress(request, buffer))
         
         else:
             request = QtNetwork.QNetworkRequest()
         
         # Url conversion
-        if isinstance(url, str):
-            url = QtCore.QUrl(url)
+        url = QtCore.QUrl(url)
+        
+        # Parameter stitching
+        # The query is copied into the url, so it must be populated first.
+        if params:
+            url = _with_query(url, params)
         
         # Url assignment
         request.setUrl(url)
         
-        # Parameter stitching
-        if params is not None:
-            # Declaration and assignment
-            q = QtCore.QUrlQuery()
-            url.setQuery(q)
-            
-            # Populate the QUrlQuery
-            for k, v in params.items():
-                q.addQueryItem(k, v)
-        
         # Header stitching
         if headers is not None:
             for k, v in headers.items():
-                # Declarations
-                key, value = None, None
-                
-                # Item validation
-                if not isinstance(k, bytes):
-                    key = k.encode(encoding='UTF-8')
-                
-                if not isinstance(v, bytes):
-                    value = v.encode(encoding='UTF-8')
-                
-                # Populate request header
-                request.setRawHeader(key, value)
+                request.setRawHeader(_encode(k), _encode(v))
+        
+        return self._prepare_upload(*self._compress(request, buffer))
+    
+    @staticmethod
+    def _prepare_data(data: typing.Any) -> typing.Union[QtCore.QIODevice, QtNetwork.QHttpMultiPart, None]:
+        """Converts the data passed to `request` into an open QIODevice, or a
+        QHttpMultiPart."""
+        if data is None or isinstance(data, QtNetwork.QHttpMultiPart):
+            return data
+        
+        # Device validation
+        if isinstance(data, QtCore.QIODevice):
+            device = data
+        
+        elif isinstance(data, (str, bytes, bytearray, memoryview)):
+            device = QtCore.QBuffer()
+            device.setData(data.encode(encoding='UTF-8') if isinstance(data, str) else bytes(data))
+        
+        elif hasattr(data, 'read'):
+            device = FileDevice(data)
+        
+        else:
+            device = IteratorDevice(data)
+        
+        # QNetworkAccessManager requires the device to be open for reading
+        if not device.isOpen():
+            device.open(QtCore.QIODevice.ReadOnly)
+        
+        return device
+    
+    def _compress(self, request: QtNetwork.QNetworkRequest,
+                  data: typing.Any) -> typing.Tuple[QtNetwork.QNetworkRequest, typing.Any]:
+        """Compresses a request's data, if the factory compresses bodies.  The
+        compression headers are set on a copy, since callers may reuse it."""
+        if self.compression is None or data is None:
+            return request, data
+        
+        request = QtNetwork.QNetworkRequest(request)
+        
+        return request, self.compression.compress(request, data)
+    
+    def _prepare_upload(self, request: QtNetwork.QNetworkRequest,
+                        data: typing.Any) -> typing.Tuple[QtNetwork.QNetworkRequest, typing.Any]:
+        """Prepares a request to send sequential data without buffering it.
+        
+        Qt can only send a sequential body as it's read when its length is
+        known up front, so bodies of an unknown length are spooled to a
+        temporary file instead of being buffered in memory by Qt.  The
+        request's headers are set on a copy, since callers may reuse it."""
+        if not isinstance(data, QtCore.QIODevice) or not data.isSequential():
+            return request, data
+        
+        # Length validation
+        length = request.header(QtNetwork.QNetworkRequest.ContentLengthHeader)
+        
+        if length is None and isinstance(data, IteratorDevice):
+            length = data.length
+        
+        if length is not None:
+            request = QtNetwork.QNetworkRequest(request)
+            request.setHeader(QtNetwork.QNetworkRequest.ContentLengthHeader, int(length))
+            request.setAttribute(QtNetwork.QNetworkRequest.DoNotBufferUploadDataAttribute, True)
+            
+            return request, data
+        
+        # Devices that produce data asynchronously can't be drained here
+        if not isinstance(data, (IteratorDevice, FileDevice)):
+            return request, data
+        
+        return request, self._spool(data)
+    
+    def _spool(self, data: QtCore.QIODevice) -> QtCore.QTemporaryFile:
+        """Copies a sequential device into a temporary file.
+        
+        :raises IOError: The temporary file couldn't be written to."""
+        # Declarations
+        file = QtCore.QTemporaryFile()
+        
+        if not file.open():
+            raise IOError(f'Could not create a temporary file for the request body! ({file.errorString()})')
+        
+        while True:
+            chunk = data.read(self.SPOOL_CHUNK_SIZE)
+            
+            if not chunk:
+                break
+            
+            if file.write(chunk) != len(chunk):
+                raise IOError(f'Could not spool the request body to disk! ({file.errorString()})')
+        
+        file.seek(0)
+        
+        return file
+    
+    def download(self, url: typing.Union[QtCore.QUrl, str], path: str, *,
+                 params: typing.Dict[str, str] = None,
+                 headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                 timeout: int = None,
+                 idle_timeout: int = None,
+                 parts: int = 1,
+                 resume: bool = False) -> Future:
+        """Downloads `url` straight into the file at `path`.
+        
+        The body is written to disk as it arrives, and the file is only replaced
+        once the download finishes successfully.  The returned future's
+        `progress` signal reports the bytes received and the total bytes, and
+        the future is resolved with a Response object whose body is empty.
+        See `request` for the timeouts.
         
-        if data is not None:
-            # Declarations
-            buffer: typing.Optional[QtCore.QBuffer] = None
+        If `parts` is greater than 1, or `resume` is True, the file is
+        downloaded through a RangedDownload, which sends up to `parts` byte
+        range requests at once and checkpoints its progress so it can be
+        resumed.  Its future is resolved with the response to the HEAD request
+        that probed the file.  Hosts that don't accept byte ranges are
+        downloaded from through a single request.
+        
+        :raises IOError: The file couldn't be opened for writing."""
+        if parts > 1 or resume:
+            return self._marshal(functools.partial(self._download_ranged, url, path, params=params, headers=headers,
+                                                   timeout=timeout, idle_timeout=idle_timeout, parts=parts,
+                                                   resume=resume))
+        
+        # Declarations
+        file = QtCore.QSaveFile(path)
+        
+        if not file.open(QtCore.QIODevice.WriteOnly):
+            raise IOError(f'Could not open "{path}" for writing! ({file.errorString()})')
+        
+        # The file is written to on the factory's thread
+        if not self._is_local():
+            file.moveToThread(self.thread())
+        
+        return self._marshal(functools.partial(self._download, url, path, file, params=params, headers=headers,
+                                               timeout=timeout, idle_timeout=idle_timeout))
+    
+    def _download(self, url: typing.Union[QtCore.QUrl, str], path: str, file: QtCore.QSaveFile, *,
+                  params: typing.Dict[str, str] = None,
+                  headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                  timeout: int = None,
+                  idle_timeout: int = None) -> Future:
+        """Starts a download into an open file on the factory's thread."""
+        request, _ = self._prepare(url, params=params, headers=headers)
+        future = self._save(request, path, file,
+                            idle_timeout=self.idle_timeout if idle_timeout is None else idle_timeout)
+        self._watch(future, timeout=self.timeout if timeout is None else timeout)
+        
+        return future
+    
+    def _download_ranged(self, url: typing.Union[QtCore.QUrl, str], path: str, *,
+                         params: typing.Dict[str, str] = None,
+                         headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None,
+                         timeout: int = None,
+                         idle_timeout: int = None,
+                         parts: int = 1,
+                         resume: bool = False) -> Future:
+        """Starts a ranged download on the factory's thread."""
+        request, _ = self._prepare(url, params=params, headers=headers)
+        download = RangedDownload(self, request, path, parts=parts, resume=resume,
+                                  idle_timeout=self.idle_timeout if idle_timeout is None else idle_timeout, parent=self)
+        
+        future = download.start()
+        self._watch(future, timeout=self.timeout if timeout is None else timeout)
+        
+        return future
+    
+    def _save(self, request: QtNetwork.QNetworkRequest, path: str, file: QtCore.QSaveFile, *,
+              idle_timeout: int = None) -> Future:
+        """Sends a GET request whose body is written into an open file, which is
+        only committed if the request succeeds.  The returned future is only
+        resolved once the file has been committed or discarded, so a failed
+        commit is reported as the future's exception."""
+        sent = self._submit('GET', request, sink=file, idle_timeout=idle_timeout)
+        future = Future()
+        
+        def on_done(f: Future):
+            response: typing.Optional[Response] = f._result
             
-            # Buffer validation
-            if isinstance(data, QtCore.QBuffer):
-                buffer = data
+            if f._exception is None and response is not None and response.is_okay():
+                if not file.commit():
+                    future._set_exception(IOError(f'Could not save "{path}"! ({file.errorString()})'))
+                    
+                    return
             
             else:
-                buffer = QtCore.QBuffer()
+                file.cancelWriting()
+                file.commit()
+            
+            if f._exception is not None:
+                future._set_exception(f._exception)
+            
+            else:
+                future._set_result(response)
+        
+        sent.progress.connect(future.progress)
+        sent.add_done_callback(on_done)
+        future._canceller = sent.cancel
+        
+        return future
+    
+    def _submit(self, op: str, request: QtNetwork.QNetworkRequest, *, data: QtCore.QBuffer = None,
+                stream: bool = False, sink: QtCore.QIODevice = None, idle_timeout: int = None) -> Future:
+        """The real implementation of the submit method.
+        
+        If sink is passed, the response's body will be written to it as it
+        arrives instead of being stored on the Response object."""
+        # Only bodiless, buffered requests can be shared between callers
+        if op not in ('GET', 'HEAD') or data is not None or stream or sink is not None:
+            return self._dispatch(op, request, data=data, stream=stream, sink=sink, idle_timeout=idle_timeout)
+        
+        # Memory cache lookup
+        cache_key = None
+        
+        if self.memory_cache is not None:
+            cache_key = self.memory_cache.key(op, request)
+            cached = self.memory_cache.get(cache_key)
+            
+            if cached is not None:
+                future = Future()
+                future._set_result(cached)
+                
+                return future
+        
+        if self.coalesce:
+            return self._coalesce(op, request, cache_key=cache_key, idle_timeout=idle_timeout)
+        
+        future = self._dispatch(op, request, idle_timeout=idle_timeout)
+        
+        if cache_key is not None:
+            future.add_done_callback(functools.partial(self._cache_response, cache_key))
+        
+        return future
+    
+    def _coalesce(self, op: str, request: QtNetwork.QNetworkRequest, *, cache_key: tuple = None,
+                  idle_timeout: int = None) -> Future:
+        """Returns a future that shares the reply of an identical request that's
+        still in flight, sending the request if there isn't one."""
+        # Declarations
+        # The idle timeout is enforced on the shared reply, so requests with
+        # different idle timeouts can't share one.
+        key = (idle_timeout, self._attributes(request),
+               fingerprint(op, request, vary=sorted(h.data().decode() for h in request.rawHeaderList())))
+        entry = self._in_flight.get(key)
+        
+        if entry is None:
+            shared = self._dispatch(op, request, idle_timeout=idle_timeout)
+            entry = self._in_flight[key] = [shared, 0]
+            
+            shared.add_done_callback(functools.partial(self._release, key))
+            
+            if cache_key is not None:
+                shared.add_done_callback(functools.partial(self._cache_response, cache_key))
+        
+        # Follower creation
+        shared = entry[0]
+        follower = Future()
+        forward = functools.partial(self._forward_copy, follower)
+        
+        entry[1] += 1
+        shared.add_done_callback(forward)
+        shared.progress.connect(follower.progress)
+        
+        follower._canceller = functools.partial(self._unfollow, key, request, follower, forward)
+        
+        return follower
+    
+    @staticmethod
+    def _attributes(request: QtNetwork.QNetworkRequest) -> tuple:
+        """Returns the values of the request's attributes that change which
+        reply it receives.  Unset attributes are None."""
+        return tuple(request.attribute(a) for a in _COALESCED_ATTRIBUTES) + (request.maximumRedirectsAllowed(),)
+    
+    def _dispatch(self, op: str, request: QtNetwork.QNetworkRequest, *, data: QtCore.QBuffer = None,
+                  stream: bool = False, sink: QtCore.QIODevice = None, idle_timeout: int = None) -> Future:
+        """Sends a request, and returns a future for its response."""
+        future = Future()
+        self._attempt(future, op, request, data=data, stream=stream, sink=sink, idle_timeout=idle_timeout, attempt=1)
+        
+        return future
+    
+    def _attempt(self, future: Future, op: str, request: QtNetwork.QNetworkRequest, *,
+                 data: QtCore.QBuffer = None, stream: bool = False, sink: QtCore.QIODevice = None,
+                 idle_timeout: int = None, attempt: int):
+        """Sends a single attempt of a request on behalf of `future`, once the
+        factory's rate limiter allows it."""
+        queued = time.monotonic()
+        
+        if self.rate_limiter is None:
+            self._send_attempt(future, op, request, data=data, stream=stream, sink=sink, idle_timeout=idle_timeout,
+                               attempt=attempt, queued=queued)
+            
+            return
+        
+        send = functools.partial(self._send_attempt, future, op, request, data=data, stream=stream, sink=sink,
+                                 idle_timeout=idle_timeout, attempt=attempt, queued=queued)
+        ticket = self.rate_limiter.schedule(request, send)
+        
+        if ticket is not None:
+            future._reply = None
+            future._canceller = functools.partial(self._dequeue, future, request, ticket)
+    
+    def _send_attempt(self, future: Future, op: str, request: QtNetwork.QNetworkRequest, *,
+                      data: QtCore.QBuffer = None, stream: bool = False, sink: QtCore.QIODevice = None,
+                      idle_timeout: int = None, attempt: int, queued: float = None):
+        """Sends a single attempt of a request on behalf of `future`."""
+        # Declarations
+        response = Response()
+        response.timings.queued = queued
+        sent = request
+        accept = None if self.compression is None else self.compression.accept_encoding()
+        
+        # Encodings Qt doesn't support have to be decompressed by the response,
+        # which means Qt must not decompress the ones it does support either.
+        if accept is not None and not request.hasRawHeader(b'Accept-Encoding'):
+            sent = QtNetwork.QNetworkRequest(request)
+            sent.setRawHeader(b'Accept-Encoding', accept)
+            response._decompress = True
+        
+        # Send the request
+        reply = self.transport.send(op, sent, data)
+        response._bind(reply)
+        
+        if stream:
+            # Capping the read buffer applies backpressure to the connection, so
+            # streamed bodies are held in memory a chunk at a time.
+            reply.setReadBufferSize(self.STREAM_BUFFER_SIZE)
+            response._stream(reply)
             
-            # Data validation
-            if isinstance(data, str):
-                buffer.setData(data.encode(encoding='UTF-8'))
+            reply.metaDataChanged.connect(functools.partial(future._set_result, response))
+        
+        elif sink is not None:
+            reply.readyRead.connect(lambda: sink.write(response._decode(reply.readAll().data())))
+        
+        reply.downloadProgress.connect(future.progress)
+        
+        if idle_timeout:
+            self._watch_idle(reply, response, idle_timeout)
+        
+        # The future holds onto the data until the reply finishes, so the buffer
+        # isn't garbage collected while Qt is still reading from it.
+        future._reply = reply
+        future._data = data
+        future._canceller = None
+        
+        reply.finished.connect(functools.partial(self._resolve, future, response, reply, op, request, data=data,
+                                                 stream=stream, sink=sink, idle_timeout=idle_timeout, attempt=attempt))
+    
+    @staticmethod
+    def _watch_idle(reply: QtNetwork.QNetworkReply, response: Response, idle_timeout: int):
+        """Aborts a reply once it hasn't sent or received anything for
+        `idle_timeout` milliseconds."""
+        # Declarations
+        timer = QtCore.QTimer(reply)
+        timer.setSingleShot(True)
+        timer.setInterval(idle_timeout)
+        
+        def on_idle():
+            response._time_out(idle_timeout)
+            reply.abort()
+        
+        timer.timeout.connect(on_idle)
+        reply.metaDataChanged.connect(timer.start)
+        reply.uploadProgress.connect(lambda *_: timer.start())
+        reply.downloadProgress.connect(lambda *_: timer.start())
+        reply.finished.connect(timer.stop)
+        
+        timer.start()
+    
+    def _watch(self, future: Future, *, timeout: int = None):
+        """Cancels a future once it hasn't been resolved within `timeout`
+        milliseconds."""
+        if not timeout or future.done():
+            return
+        
+        # Declarations
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        
+        def on_timeout():
+            future.remove_done_callback(on_done)
+            timer.deleteLater()
+            
+            if not future.done():
+                # The response is marked before any other callback can see it
+                future.add_done_callback(functools.partial(self._mark_timed_out, timeout), first=True)
+                future.cancel()
+        
+        def on_done(_: Future):
+            timer.stop()
+            timer.deleteLater()
+        
+        timer.timeout.connect(on_timeout)
+        future.add_done_callback(on_done)
+        
+        timer.start(timeout)
+    
+    @staticmethod
+    def _mark_timed_out(timeout: int, future: Future):
+        """Marks the response of a future that was cancelled by its timeout."""
+        response: typing.Optional[Response] = future._result
+        
+        if response is not None:
+            response._time_out(timeout)
+    
+    def _release(self, key: tuple, shared: Future):
+        """Removes a finished request from the in-flight registry."""
+        entry = self._in_flight.get(key)
+        
+        if entry is not None and entry[0] is shared:
+            del self._in_flight[key]
+    
+    def _unfollow(self, key: tuple, request: QtNetwork.QNetworkRequest, follower: Future,
+                  forward: typing.Callable[[Future], None]):
+        """Detaches a cancelled follower from its shared request.  The shared
+        request is only aborted once every follower has been cancelled."""
+        entry = self._in_flight.get(key)
+        
+        if entry is not None:
+            shared = entry[0]
+            entry[1] -= 1
+            shared.remove_done_callback(forward)
+            shared.progress.disconnect(follower.progress)
             
-            elif isinstance(data, bytes):
-                buffer.setData(data)
+            if entry[1] <= 0:
+                shared.cancel()
+        
+        follower._set_result(self._cancelled_response(request))
+    
+    def _dequeue(self, future: Future, request: QtNetwork.QNetworkRequest, ticket: list):
+        """Removes a cancelled request from the rate limiter's queue."""
+        self.rate_limiter.cancel(ticket)
+        future._set_result(self._cancelled_response(request))
+    
+    @staticmethod
+    def _cancelled_response(request: QtNetwork.QNetworkRequest) -> Response:
+        """Creates a Response object for a request that was cancelled before it
+        was sent.  The response mirrors what an aborted reply would produce."""
+        response = Response()
+        response._insert_url(request.url())
+        response._update_code(QtNetwork.QNetworkReply.OperationCanceledError)
+        response._update_error_string('Operation canceled')
+        
+        return response
+    
+    @staticmethod
+    def _forward(follower: Future, shared: Future):
+        """Resolves a follower with the result of its shared request."""
+        if shared._exception is not None:
+            follower._set_exception(shared._exception)
         
         else:
-            buffer = None
+            follower._set_result(shared._result)
+    
+    @staticmethod
+    def _forward_copy(follower: Future, shared: Future):
+        """Resolves a coalesced follower with a copy of its shared request's
+        response, so followers can't see each other's changes."""
+        if shared._exception is not None:
+            follower._set_exception(shared._exception)
+        
+        else:
+            follower._set_result(shared._result._copy())
+    
+    def _cache_response(self, key: tuple, future: Future):
+        """Stores a finished future's response in the memory cache."""
+        response: typing.Optional[Response] = future._result
         
-        return self._request(op.upper(), request, data=buffer)
+        if self.memory_cache is not None and response is not None and response.is_okay():
+            self.memory_cache.put(key, response)
     
-    def _request(self, op: str, request: QtNetwork.QNetworkRequest, *, data: QtCore.QBuffer = None):
-        """The real implementation of the request method."""
-        # Send the request & return the Response object
-        return Response.from_reply(self._manager.sendCustomRequest(request, op.encode(encoding='UTF-8'), data))
+    def _resolve(self, future: Future, response: Response, reply: QtNetwork.QNetworkReply, op: str,
+                 request: QtNetwork.QNetworkRequest, *, data: QtCore.QBuffer = None, stream: bool = False,
+                 sink: QtCore.QIODevice = None, idle_timeout: int = None, attempt: int):
+        """Resolves a future with its response once the reply finishes, unless
+        the factory's retry policy says the request should be sent again."""
+        # Aborted replies are closed, so there's nothing left to read
+        if sink is not None and reply.isOpen():
+            sink.write(response._decode(reply.readAll().data(), final=True))
+        
+        response._finalize(reply)
+        self.metrics.record(response)
+        
+        # Streamed responses have already been handed to the caller
+        retryable = self.retry is not None and not stream and not future.cancelled()
+        
+        if retryable and self.retry.should_retry(op, response, attempt) and self._rewind(data, sink):
+            self._schedule_retry(future, response, op, request, data=data, sink=sink, idle_timeout=idle_timeout,
+                                 attempt=attempt)
+        
+        else:
+            future._set_result(response)
+    
+    def _schedule_retry(self, future: Future, response: Response, op: str, request: QtNetwork.QNetworkRequest, *,
+                        data: QtCore.QBuffer = None, sink: QtCore.QIODevice = None, idle_timeout: int = None,
+                        attempt: int):
+        """Sends the next attempt of a request once its backoff has elapsed.  The
+        backoff is waited on a timer, so the event loop isn't blocked."""
+        # Declarations
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        
+        def on_timeout():
+            timer.deleteLater()
+            self._attempt(future, op, request, data=data, sink=sink, idle_timeout=idle_timeout, attempt=attempt + 1)
+        
+        def on_cancel():
+            # Cancelling during the backoff resolves the future with the last response
+            timer.stop()
+            timer.deleteLater()
+            future._set_result(response)
+        
+        timer.timeout.connect(on_timeout)
+        future._reply = None
+        future._canceller = on_cancel
+        
+        timer.start(int(self.retry.delay(attempt, response) * 1000))
+    
+    @staticmethod
+    def _rewind(data: typing.Any, sink: typing.Optional[QtCore.QIODevice]) -> bool:
+        """Rewinds a request's data and sink, so the request can be sent again.
+        
+        :returns bool: Whether or not the request can be sent again."""
+        if isinstance(data, QtNetwork.QHttpMultiPart):
+            return False
+        
+        if data is not None and (data.isSequential() or not data.seek(0)):
+            return False
+        
+        if sink is not None:
+            if not isinstance(sink, QtCore.QFileDevice) or not sink.seek(0) or not sink.resize(0):
+                return False
+        
+        return True
@@ -0,0 +1,310 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import asyncio
+import logging
+import threading
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+from .. import signals
+
+__all__ = ['CancelToken', 'Future']
+
+logger = logging.getLogger(__name__)
+
+
+class Future(QtCore.QObject):
+    """A placeholder for a response that hasn't finished yet.
+    
+    Futures are returned by `Factory.submit`, and are resolved once the
+    underlying QNetworkReply emits its `finished` signal.  Futures can also be
+    awaited from coroutines running on a `QtUtilities.aio.QtEventLoop`.
+    
+    Futures may be resolved on another thread, like a threaded factory's.
+    Done callbacks are invoked on the thread that resolved the future, while
+    slots connected to `finished` are invoked on their own thread."""
+    finished = QtCore.pyqtSignal(object)
+    progress = QtCore.pyqtSignal('qint64', 'qint64')  # Emitted with the bytes received, and the total bytes (-1 if unknown).
+    
+    def __init__(self, *, parent: QtCore.QObject = None):
+        # Super call
+        super(Future, self).__init__(parent=parent)
+        
+        # Private attributes
+        self._result = None
+        self._exception: typing.Optional[BaseException] = None
+        self._done = False
+        self._cancelled = False
+        self._callbacks: typing.List[typing.Callable[['Future'], None]] = []
+        self._reply: typing.Optional[QtNetwork.QNetworkReply] = None
+        self._data: typing.Optional[QtCore.QIODevice] = None
+        self._canceller: typing.Optional[typing.Callable[[], None]] = None
+        self._event = threading.Event()  # Set once the future is resolved, for threads without an event loop
+    
+    # State methods
+    def done(self) -> bool:
+        """Whether or not the future has been resolved."""
+        return self._done
+    
+    def cancelled(self) -> bool:
+        """Whether or not the future was cancelled before it finished."""
+        return self._cancelled
+    
+    def cancel(self) -> bool:
+        """Aborts the underlying reply.  The future will still be resolved
+        with a Response whose code is `OperationCanceledError`.
+        
+        :returns bool: Whether or not the future could be cancelled."""
+        if self._done:
+            return False
+        
+        self._cancelled = True
+        
+        if self._reply is not None:
+            self._reply.abort()
+        
+        elif self._canceller is not None:
+            self._canceller()
+        
+        return True
+    
+    # Result methods
+    def result(self, timeout: int = None):
+        """Returns the future's result.  If the future hasn't been resolved yet,
+        this method will wait for it on a nested event loop.
+        
+        :param timeout: The amount of milliseconds to wait before timing out.
+        :raises TimeoutError: The future wasn't resolved in time."""
+        self._block(timeout)
+        
+        if not self._done:
+            raise TimeoutError(f'Future was not resolved within {timeout}ms!')
+        
+        if self._exception is not None:
+            raise self._exception
+        
+        return self._result
+    
+    def exception(self, timeout: int = None) -> typing.Optional[BaseException]:
+        """Returns the exception the future was resolved with, if any.
+        
+        :param timeout: The amount of milliseconds to wait before timing out.
+        :raises TimeoutError: The future wasn't resolved in time."""
+        self._block(timeout)
+        
+        if not self._done:
+            raise TimeoutError(f'Future was not resolved within {timeout}ms!')
+        
+        return self._exception
+    
+    # Callback methods
+    def add_done_callback(self, func: typing.Callable[['Future'], None], *, first: bool = False):
+        """Adds a callable to invoke with this future once it's resolved.  If
+        the future is already resolved, `func` will be invoked immediately.
+        
+        If `first` is True, `func` will be invoked before the callbacks that
+        were already added."""
+        if self._done:
+            self._invoke(func)
+        
+        elif first:
+            self._callbacks.insert(0, func)
+        
+        else:
+            self._callbacks.append(func)
+    
+    def remove_done_callback(self, func: typing.Callable[['Future'], None]) -> int:
+        """Removes every instance of `func` from the callback list.
+        
+        :returns int: The amount of callbacks removed."""
+        remaining = [c for c in self._callbacks if c != func]
+        removed = len(self._callbacks) - len(remaining)
+        self._callbacks = remaining
+        
+        return removed
+    
+    # Async methods
+    def __await__(self):
+        """Waits for the future to be resolved without spinning a nested event
+        loop.  Cancelling the awaiting task aborts the underlying reply."""
+        return self._wait().__await__()
+    
+    async def _wait(self):
+        """The real implementation of `__await__`."""
+        if not self._done:
+            try:
+                await signals.wait(self.finished)
+            
+            except asyncio.CancelledError:
+                self.cancel()
+                raise
+        
+        return self.result()
+    
+    # Internal methods
+    def _block(self, timeout: int = None):
+        """Waits for the future to be resolved.
+        
+        Threads with a Qt event dispatcher wait on a nested event loop, so they
+        keep processing events.  Other threads, like plain Python threads,
+        block on an event instead."""
+        if self._done:
+            return
+        
+        if QtCore.QAbstractEventDispatcher.instance() is None:
+            self._event.wait(None if timeout is None else timeout / 1000)
+            
+            return
+        
+        # Declarations
+        loop = QtCore.QEventLoop()
+        timer = QtCore.QTimer()
+        timer.setSingleShot(True)
+        
+        self.finished.connect(loop.quit)
+        timer.timeout.connect(loop.quit)
+        
+        try:
+            # The future may have been resolved on another thread while the
+            # signal was being connected.
+            if not self._done:
+                if timeout is not None and timeout > 0:
+                    timer.start(timeout)
+                
+                loop.exec()
+        
+        finally:
+            self.finished.disconnect(loop.quit)
+            timer.stop()
+            timer.deleteLater()
+            loop.deleteLater()
+    
+    def _set_result(self, result):
+        """Resolves the future with `result`."""
+        if self._done:
+            return
+        
+        self._result = result
+        self._finish()
+    
+    def _set_exception(self, exception: BaseException):
+        """Resolves the future with `exception`."""
+        if self._done:
+            return
+        
+        self._exception = exception
+        self._finish()
+    
+    def _finish(self):
+        """Marks the future as resolved, and notifies any listeners."""
+        self._done = True
+        self._reply = None
+        self._data = None
+        self._canceller = None
+        
+        callbacks, self._callbacks = self._callbacks, []
+        
+        for func in callbacks:
+            self._invoke(func)
+        
+        self._event.set()
+        self.finished.emit(self)
+    
+    def _invoke(self, func: typing.Callable[['Future'], None]):
+        """Invokes a done callback, logging any exceptions it raises."""
+        try:
+            func(self)
+        
+        except Exception as e:
+            logger.warning(f'Done callback {func!r} raised an exception! ({e})')
+    
+    # Magic methods
+    def __repr__(self):
+        if self._cancelled:
+            state = 'cancelled'
+        
+        elif self._done:
+            state = 'finished'
+        
+        else:
+            state = 'pending'
+        
+        return f'<{self.__class__.__name__} state={state}>'
+
+
+class CancelToken(QtCore.QObject):
+    """A handle for cancelling requests from elsewhere in an application.
+    
+    Requests issued with a token are cancelled when the token is, which lets
+    a synchronous request be cancelled while its caller waits on a nested
+    event loop.  Requests issued with an already cancelled token are
+    cancelled immediately."""
+    cancelled = QtCore.pyqtSignal()
+    
+    def __init__(self, *, parent: QtCore.QObject = None):
+        # Super call
+        super(CancelToken, self).__init__(parent=parent)
+        
+        # Private attributes
+        self._cancelled = False
+        self._futures: typing.List[Future] = []
+    
+    # State methods
+    def is_cancelled(self) -> bool:
+        """Whether or not the token has been cancelled."""
+        return self._cancelled
+    
+    def cancel(self):
+        """Cancels every pending request issued with the token."""
+        if self._cancelled:
+            return
+        
+        self._cancelled = True
+        futures, self._futures = self._futures, []
+        
+        for future in futures:
+            future.cancel()
+        
+        self.cancelled.emit()
+    
+    # Internal methods
+    def _register(self, future: Future):
+        """Ties a future to the token until the future is resolved."""
+        if self._cancelled:
+            future.cancel()
+        
+        elif not future.done():
+            self._futures.append(future)
+            future.add_done_callback(self._unregister)
+    
+    def _unregister(self, future: Future):
+        """Forgets a resolved future."""
+        try:
+            self._futures.remove(future)
+        
+        except ValueError:
+            pass
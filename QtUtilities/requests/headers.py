@@ -0,0 +1,148 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections.abc
+import typing
+
+__all__ = ['Headers', 'parse_links']
+
+
+def parse_links(value: str) -> typing.List[typing.Tuple[str, typing.Dict[str, str]]]:
+    """Parses a `Link` header, as described by RFC 8288, into a list of
+    targets and their parameters.  Parameter names are lowercased."""
+    links = []
+    position = 0
+    
+    while True:
+        start = value.find('<', position)
+        end = value.find('>', start + 1)
+        
+        if start < 0 or end < 0:
+            return links
+        
+        target, params = value[start + 1:end], {}
+        position = end + 1
+        
+        # Parameters run until the comma that separates links, which may
+        # also appear within quoted values.
+        while position < len(value) and value[position] != ',':
+            if value[position] in ' \t;':
+                position += 1
+                
+                continue
+            
+            name_end = position
+            
+            while name_end < len(value) and value[name_end] not in '=;,':
+                name_end += 1
+            
+            name = value[position:name_end].strip().lower()
+            position = name_end
+            
+            if position < len(value) and value[position] == '=':
+                position += 1
+                
+                if position < len(value) and value[position] == '"':
+                    closing = value.find('"', position + 1)
+                    closing = len(value) if closing < 0 else closing
+                    params[name] = value[position + 1:closing]
+                    position = closing + 1
+                
+                else:
+                    value_end = position
+                    
+                    while value_end < len(value) and value[value_end] not in ';,':
+                        value_end += 1
+                    
+                    params[name] = value[position:value_end].strip()
+                    position = value_end
+            
+            elif name:
+                params[name] = ''
+        
+        links.append((target, params))
+
+
+class Headers(collections.abc.Mapping):
+    """A read-only, case-insensitive view of the raw header pairs a host sent.
+    
+    The pairs are stored as they were received, and are only decoded when a
+    header is looked up."""
+    __slots__ = ('_pairs', '_index')
+    
+    def __init__(self, pairs: typing.Sequence[typing.Tuple[bytes, bytes]] = ()):
+        self._pairs = tuple(pairs)
+        self._index: typing.Optional[typing.Dict[bytes, int]] = None
+    
+    # Properties
+    @property
+    def raw(self) -> typing.Tuple[typing.Tuple[bytes, bytes], ...]:
+        """The header pairs, as they were received."""
+        return self._pairs
+    
+    # Lookup methods
+    def get_raw(self, key: typing.AnyStr, default: bytes = None) -> typing.Optional[bytes]:
+        """Returns the undecoded value of the header `key`."""
+        index = self._lookup(key)
+        
+        return default if index is None else self._pairs[index][1]
+    
+    # Internal methods
+    def _lookup(self, key: typing.AnyStr) -> typing.Optional[int]:
+        """Returns the position of the header `key` within the pairs."""
+        if self._index is None:
+            # Headers received later take precedence, like they would in a dict
+            self._index = {k.lower(): i for i, (k, _) in enumerate(self._pairs)}
+        
+        if isinstance(key, str):
+            key = key.encode(encoding='latin-1', errors='replace')
+        
+        return self._index.get(key.lower())
+    
+    @staticmethod
+    def _decode(value: bytes) -> str:
+        """Decodes a raw header key or value."""
+        return value.decode(encoding='UTF-8', errors='replace')
+    
+    # Magic methods
+    def __getitem__(self, key: typing.AnyStr) -> str:
+        index = self._lookup(key)
+        
+        if index is None:
+            raise KeyError(key)
+        
+        return self._decode(self._pairs[index][1])
+    
+    def __contains__(self, key) -> bool:
+        return isinstance(key, (str, bytes)) and self._lookup(key) is not None
+    
+    def __iter__(self) -> typing.Iterator[str]:
+        return (self._decode(k) for k, _ in self._pairs)
+    
+    def __len__(self) -> int:
+        return len(self._pairs)
+    
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self)!r})'
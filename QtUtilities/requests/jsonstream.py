@@ -0,0 +1,189 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import codecs
+import json
+import typing
+
+__all__ = ['iter_items']
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789+-.eE'
+
+
+class _Reader:
+    """Incrementally decodes chunks of a JSON document into a text buffer, and
+    parses values from it as enough of the document arrives."""
+    
+    def __init__(self, chunks: typing.Iterable[bytes], encoding: str):
+        # Public attributes
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        
+        # Private attributes
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+    
+    # Reader methods
+    def fill(self) -> bool:
+        """Appends the next chunk of the document to the buffer, discarding the
+        text that was already parsed.
+        
+        :returns bool: Whether or not any text was appended."""
+        if self.eof:
+            return False
+        
+        text = ''
+        
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            
+            if text:
+                break
+        
+        else:
+            text = self._decoder.decode(b'', final=True)
+            self.eof = True
+        
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        
+        return bool(text)
+    
+    def peek(self) -> str:
+        """Skips whitespace, and returns the next character without consuming
+        it.  An empty string is returned at the end of the document."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            
+            if not self.fill() and self.eof:
+                return ''
+    
+    def expect(self, character: str):
+        """Consumes the next character, which must be `character`."""
+        found = self.peek()
+        
+        if found != character:
+            raise ValueError(f'Expected {character!r} in JSON document, but found {found or "EOF"!r}!')
+        
+        self.position += 1
+    
+    def value(self) -> typing.Any:
+        """Parses the next complete value in the document."""
+        self.peek()
+        
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+            
+            except json.JSONDecodeError:
+                # The value may just be incomplete
+                if self.fill() or not self.eof:
+                    continue
+                
+                raise
+            
+            if self._incomplete_number(end):
+                self.fill()
+                
+                continue
+            
+            self.position = end
+            
+            return value
+    
+    # Internal methods
+    def _incomplete_number(self, end: int) -> bool:
+        """Whether or not the value parsed up to `end` is a number that may
+        continue in the next chunk.  Numbers stop parsing early at a "." or an
+        exponent that's split from its digits."""
+        if self.eof or self.buffer[self.position] not in _NUMBER:
+            return False
+        
+        for index in range(end, len(self.buffer)):
+            if self.buffer[index] not in _NUMBER:
+                return False
+        
+        return True
+
+
+def iter_items(chunks: typing.Iterable[bytes], path: str = '', *, encoding: str = 'UTF-8') -> typing.Iterator:
+    """Yields the elements of a JSON array as the chunks of its document arrive.
+    
+    `path` is a dot separated list of object keys leading to the array, or an
+    empty string if the document itself is the array.  Values outside of the
+    array are parsed, then discarded.  If the path doesn't exist, nothing is
+    yielded.
+    
+    :raises ValueError: The document isn't valid JSON, or `path` doesn't lead
+    to an array."""
+    reader = _Reader(chunks, encoding)
+    
+    # Navigate to the array
+    for key in path.split('.') if path else []:
+        reader.expect('{')
+        
+        while True:
+            if reader.peek() == '}':
+                return
+            
+            name = reader.value()
+            
+            if not isinstance(name, str):
+                raise ValueError(f'Expected an object key in JSON document, but found {name!r}!')
+            
+            reader.expect(':')
+            
+            if name == key:
+                break
+            
+            reader.value()
+            
+            if reader.peek() == ',':
+                reader.position += 1
+    
+    # Yield the array's elements
+    reader.expect('[')
+    
+    if reader.peek() == ']':
+        return
+    
+    while True:
+        yield reader.value()
+        
+        character = reader.peek()
+        reader.position += 1
+        
+        if character == ']':
+            return
+        
+        elif character != ',':
+            raise ValueError(f'Expected "," or "]" in JSON document, but found {character or "EOF"!r}!')
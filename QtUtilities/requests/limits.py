@@ -0,0 +1,248 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections
+import math
+import time
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+__all__ = ['TokenBucket', 'RateLimiter']
+
+
+def _check_limit(rate: float, capacity: float):
+    """Ensures a bucket with `rate` and `capacity` can hand out whole tokens.
+    
+    :raises ValueError: The rate isn't positive, or the capacity is below one."""
+    if rate <= 0:
+        raise ValueError(f'Rates must be greater than 0, not {rate}!')
+    
+    if capacity < 1:
+        raise ValueError(f'Buckets must hold at least 1 token, not {capacity}!')
+
+
+class TokenBucket:
+    """A token bucket that refills at `rate` tokens per second, and holds at
+    most `capacity` tokens.
+    
+    :raises ValueError: `rate` isn't positive, or `capacity` is below one."""
+    
+    def __init__(self, rate: float, capacity: float):
+        _check_limit(rate, capacity)
+        
+        # Public attributes
+        self.rate = rate
+        self.capacity = capacity
+        
+        # Private attributes
+        self._tokens = capacity
+        self._updated = time.monotonic()
+    
+    # Properties
+    @property
+    def tokens(self) -> float:
+        """The amount of tokens currently in the bucket."""
+        self._refill()
+        
+        return self._tokens
+    
+    # Bucket methods
+    def consume(self, amount: float = 1) -> bool:
+        """Removes `amount` tokens from the bucket if there are enough.
+        
+        :returns bool: Whether or not the tokens were consumed."""
+        self._refill()
+        
+        if self._tokens < amount:
+            return False
+        
+        self._tokens -= amount
+        
+        return True
+    
+    def wait_time(self, amount: float = 1) -> float:
+        """The amount of seconds until `amount` tokens will be available."""
+        self._refill()
+        
+        if self._tokens >= amount:
+            return 0.0
+        
+        return (amount - self._tokens) / self.rate
+    
+    # Internal methods
+    def _refill(self):
+        """Adds the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RateLimiter(QtCore.QObject):
+    """Paces requests with a token bucket per host.
+    
+    Requests that arrive while a bucket is empty are queued, and dispatched in
+    order by timers as the bucket refills.  `key` may be passed to group
+    requests by something other than their host, and `set_limit` overrides the
+    default rate for a single key.
+    
+    :raises ValueError: `rate` isn't positive, or `burst` is below one."""
+    
+    def __init__(self, rate: float, *, burst: float = None,
+                 key: typing.Callable[[QtNetwork.QNetworkRequest], str] = None, parent: QtCore.QObject = None):
+        # Super call
+        super(RateLimiter, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        
+        # Attribute validation
+        _check_limit(self.rate, self.burst)
+        
+        # Metrics
+        self.dispatched = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        
+        # Private attributes
+        self._key = key if key is not None else lambda r: r.url().host()
+        self._limits: typing.Dict[str, typing.Tuple[float, float]] = {}
+        self._buckets: typing.Dict[str, TokenBucket] = {}
+        self._queues: typing.Dict[str, typing.Deque[list]] = {}
+        self._timers: typing.Dict[str, QtCore.QTimer] = {}
+    
+    # Properties
+    @property
+    def queue_depth(self) -> int:
+        """The amount of requests waiting for a token."""
+        return sum(len(q) for q in self._queues.values())
+    
+    # Limit methods
+    def set_limit(self, key: str, rate: float, *, burst: float = None):
+        """Overrides the rate, and burst size, of requests for `key`.
+        
+        :raises ValueError: `rate` isn't positive, or `burst` is below one."""
+        burst = burst if burst is not None else max(1.0, rate)
+        _check_limit(rate, burst)
+        self._limits[key] = (rate, burst)
+        
+        bucket = self._buckets.get(key)
+        
+        if bucket is not None:
+            bucket.rate, bucket.capacity = rate, burst
+    
+    # Scheduling methods
+    def schedule(self, request: QtNetwork.QNetworkRequest, callback: typing.Callable[[], None]) -> typing.Optional[list]:
+        """Invokes `callback` once `request` may be sent.  If a token is
+        available, `callback` is invoked immediately.
+        
+        :returns list: A ticket that can be passed to `cancel`, or None if the
+        callback was already invoked."""
+        key = self._key(request)
+        bucket = self._bucket(key)
+        queue = self._queues.setdefault(key, collections.deque())
+        
+        if not queue and bucket.consume():
+            self._record(0.0)
+            callback()
+            
+            return None
+        
+        ticket = [key, time.monotonic(), callback]
+        queue.append(ticket)
+        self.delayed += 1
+        self._arm(key)
+        
+        return ticket
+    
+    def cancel(self, ticket: list) -> bool:
+        """Removes a queued request.
+        
+        :returns bool: Whether or not the request was still queued."""
+        queue = self._queues.get(ticket[0])
+        
+        try:
+            queue.remove(ticket)
+        
+        except (AttributeError, ValueError):
+            return False
+        
+        return True
+    
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """Returns the limiter's metrics, for monitoring."""
+        return {
+            'queued': self.queue_depth,
+            'queued_per_key': {k: len(q) for k, q in self._queues.items() if q},
+            'dispatched': self.dispatched,
+            'delayed': self.delayed,
+            'average_wait': self.total_wait / self.dispatched if self.dispatched else 0.0,
+            'max_wait': self.max_wait
+        }
+    
+    # Internal methods
+    def _bucket(self, key: str) -> TokenBucket:
+        """Returns the token bucket for `key`, creating it if needed."""
+        bucket = self._buckets.get(key)
+        
+        if bucket is None:
+            rate, burst = self._limits.get(key, (self.rate, self.burst))
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        
+        return bucket
+    
+    def _arm(self, key: str):
+        """Starts the timer that dispatches `key`'s queue once a token refills."""
+        timer = self._timers.get(key)
+        
+        if timer is None:
+            timer = self._timers[key] = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.setTimerType(QtCore.Qt.PreciseTimer)
+            timer.timeout.connect(lambda: self._drain(key))
+        
+        if not timer.isActive():
+            timer.start(math.ceil(self._bucket(key).wait_time() * 1000))
+    
+    def _drain(self, key: str):
+        """Dispatches as many of `key`'s queued requests as there are tokens."""
+        queue = self._queues.get(key)
+        bucket = self._bucket(key)
+        
+        while queue and bucket.consume():
+            _, queued, callback = queue.popleft()
+            self._record(time.monotonic() - queued)
+            callback()
+        
+        if queue:
+            self._arm(key)
+    
+    def _record(self, waited: float):
+        """Records the amount of seconds a request waited for a token."""
+        self.dispatched += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
@@ -0,0 +1,211 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import collections
+import math
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from .response import Response
+
+__all__ = ['HostMetrics', 'Metrics', 'Timings']
+
+
+class Timings:
+    """The moments a request went through each of its phases.
+    
+    Every moment is a `time.monotonic` timestamp, or None if the request
+    never reached that phase."""
+    __slots__ = ('queued', 'sent', 'first_byte', 'redirects', 'finished')
+    
+    def __init__(self):
+        self.queued: typing.Optional[float] = None
+        self.sent: typing.Optional[float] = None
+        self.first_byte: typing.Optional[float] = None
+        self.redirects: typing.List[float] = []
+        self.finished: typing.Optional[float] = None
+    
+    # Properties
+    @property
+    def waiting(self) -> typing.Optional[float]:
+        """The amount of seconds the request waited before it was sent."""
+        return self._between(self.queued, self.sent)
+    
+    @property
+    def latency(self) -> typing.Optional[float]:
+        """The amount of seconds between the request being sent, and the first
+        byte of its response arriving."""
+        return self._between(self.sent, self.first_byte)
+    
+    @property
+    def transfer(self) -> typing.Optional[float]:
+        """The amount of seconds between the first byte of the response
+        arriving, and the response finishing."""
+        return self._between(self.first_byte, self.finished)
+    
+    @property
+    def total(self) -> typing.Optional[float]:
+        """The amount of seconds between the request being sent, or queued if it
+        was, and the response finishing."""
+        return self._between(self.sent if self.queued is None else self.queued, self.finished)
+    
+    # Internal methods
+    def _mark_first_byte(self):
+        """Records the arrival of the response's first byte, if it wasn't
+        already recorded."""
+        if self.first_byte is None:
+            self.first_byte = time.monotonic()
+    
+    @staticmethod
+    def _between(start: typing.Optional[float], end: typing.Optional[float]) -> typing.Optional[float]:
+        """Returns the amount of seconds between two moments, if both exist."""
+        if start is None or end is None:
+            return None
+        
+        return end - start
+    
+    # Conversion methods
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """Returns the timings as a dict, for logging."""
+        return {
+            'queued': self.queued,
+            'sent': self.sent,
+            'first_byte': self.first_byte,
+            'redirects': list(self.redirects),
+            'finished': self.finished,
+            'waiting': self.waiting,
+            'latency': self.latency,
+            'transfer': self.transfer,
+            'total': self.total
+        }
+
+
+class HostMetrics:
+    """The counters and recent latencies of the requests sent to a host.
+    
+    Only the latest `window` latencies are kept, so percentiles reflect the
+    host's recent behaviour."""
+    
+    def __init__(self, window: int = 1024):
+        # Public attributes
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        
+        # Private attributes
+        self._latencies: typing.Deque[float] = collections.deque(maxlen=window)
+    
+    # Recording methods
+    def record(self, response: 'Response'):
+        """Records a finished response."""
+        self.requests += 1
+        self.bytes_sent += response.bytes_sent
+        self.bytes_received += response.bytes_received
+        
+        if not response.is_okay():
+            self.errors += 1
+        
+        total = response.timings.total
+        
+        if total is not None:
+            self._latencies.append(total)
+    
+    # Query methods
+    def percentile(self, percent: float) -> typing.Optional[float]:
+        """Returns the recent latency below which `percent` percent of requests
+        finished, in seconds.  If no latencies were recorded, None will be
+        returned."""
+        return self._nearest_rank(sorted(self._latencies.copy()), percent)
+    
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """Returns the host's metrics as a dict, for exporting."""
+        latencies = sorted(self._latencies.copy())
+        
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency': {
+                'count': len(latencies),
+                'mean': sum(latencies) / len(latencies) if latencies else None,
+                'max': latencies[-1] if latencies else None,
+                'p50': self._nearest_rank(latencies, 50),
+                'p95': self._nearest_rank(latencies, 95),
+                'p99': self._nearest_rank(latencies, 99)
+            }
+        }
+    
+    # Internal methods
+    @staticmethod
+    def _nearest_rank(latencies: typing.List[float], percent: float) -> typing.Optional[float]:
+        """Returns a percentile of an already sorted list of latencies."""
+        if not latencies:
+            return None
+        
+        return latencies[max(0, math.ceil(percent / 100 * len(latencies)) - 1)]
+
+
+class Metrics:
+    """The metrics of every request a factory sent, grouped by host."""
+    
+    def __init__(self, *, window: int = 1024):
+        # Public attributes
+        self.window = window
+        
+        # Private attributes
+        self._hosts: typing.Dict[str, HostMetrics] = {}
+    
+    # Recording methods
+    def record(self, response: 'Response'):
+        """Records a finished response under its host."""
+        self.host(response.urls[0].host() if response.urls else '').record(response)
+    
+    def reset(self):
+        """Forgets every recorded response."""
+        self._hosts.clear()
+    
+    # Query methods
+    def host(self, host: str) -> HostMetrics:
+        """Returns the metrics of a host, creating them if the host hasn't been
+        recorded yet."""
+        metrics = self._hosts.get(host)
+        
+        if metrics is None:
+            metrics = self._hosts[host] = HostMetrics(self.window)
+        
+        return metrics
+    
+    def hosts(self) -> typing.List[str]:
+        """Returns the hosts that have been recorded."""
+        return list(self._hosts)
+    
+    def as_dict(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Returns the metrics of every host as a dict, for exporting."""
+        # The hosts are copied first, since a threaded factory may be recording
+        # responses while they're exported.
+        return {host: metrics.as_dict() for host, metrics in list(self._hosts.items())}
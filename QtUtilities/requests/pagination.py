@@ -0,0 +1,134 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import dataclasses
+import typing
+
+from PyQt5 import QtCore
+
+from .prepared import _with_query
+
+if typing.TYPE_CHECKING:
+    from .response import Response
+
+__all__ = ['CursorPagination', 'LinkPagination', 'OffsetPagination', 'Pagination']
+
+_MISSING = object()
+
+
+def _walk(document: typing.Any, path: str, default: typing.Any = _MISSING) -> typing.Any:
+    """Returns the value at a dot separated path of object keys within a JSON
+    document.
+    
+    :raises KeyError: The path doesn't exist, and no default was passed."""
+    for key in filter(None, path.split('.')):
+        if not isinstance(document, dict) or key not in document:
+            if default is _MISSING:
+                raise KeyError(f'"{path}" does not exist in the response!')
+            
+            return default
+        
+        document = document[key]
+    
+    return document
+
+
+@dataclasses.dataclass(frozen=True)
+class Pagination:
+    """Describes how a paged endpoint is walked by `Factory.paginate`.
+    
+    `items` is a dot separated list of object keys leading to the array of
+    records within each page, or an empty string if the page itself is the
+    array.  Subclasses decide where the next page is."""
+    items: str = ''
+    
+    # Pagination methods
+    def first_url(self, url: QtCore.QUrl) -> QtCore.QUrl:
+        """Returns the url of the first page."""
+        return url
+    
+    def next_url(self, url: QtCore.QUrl, response: 'Response', records: list) -> typing.Optional[QtCore.QUrl]:
+        """Returns the url of the page after the one at `url`, or None if it
+        was the last page."""
+        raise NotImplementedError
+    
+    def records(self, response: 'Response') -> list:
+        """Returns the records within a page.
+        
+        :raises TypeError: The page's records aren't an array."""
+        records = _walk(response.json(), self.items)
+        
+        if not isinstance(records, list):
+            raise TypeError(f'Expected an array of records at "{self.items}", got {type(records).__name__}!')
+        
+        return records
+
+
+@dataclasses.dataclass(frozen=True)
+class LinkPagination(Pagination):
+    """Follows the `Link` header of each page, as described by RFC 8288."""
+    rel: str = 'next'
+    
+    def next_url(self, url: QtCore.QUrl, response: 'Response', records: list) -> typing.Optional[QtCore.QUrl]:
+        return response.links.get(self.rel)
+
+
+@dataclasses.dataclass(frozen=True)
+class CursorPagination(Pagination):
+    """Passes the cursor found in each page's body as the `param` query item
+    of the next page.  `cursor` is a dot separated path like `items`, and the
+    last page is the one without a cursor."""
+    cursor: str = 'next_cursor'
+    param: str = 'cursor'
+    
+    def next_url(self, url: QtCore.QUrl, response: 'Response', records: list) -> typing.Optional[QtCore.QUrl]:
+        cursor = _walk(response.json(), self.cursor, None)
+        
+        if cursor is None or cursor == '' or cursor is False:
+            return None
+        
+        return _with_query(url, {self.param: str(cursor)})
+
+
+@dataclasses.dataclass(frozen=True)
+class OffsetPagination(Pagination):
+    """Requests `limit` records at a time through the `offset_param` and
+    `limit_param` query items.  The last page is the first one with less than
+    `limit` records."""
+    limit: int = 100
+    start: int = 0
+    offset_param: str = 'offset'
+    limit_param: str = 'limit'
+    
+    def first_url(self, url: QtCore.QUrl) -> QtCore.QUrl:
+        return _with_query(url, {self.offset_param: str(self.start), self.limit_param: str(self.limit)})
+    
+    def next_url(self, url: QtCore.QUrl, response: 'Response', records: list) -> typing.Optional[QtCore.QUrl]:
+        if len(records) < self.limit:
+            return None
+        
+        offset = int(QtCore.QUrlQuery(url).queryItemValue(self.offset_param) or self.start)
+        
+        return _with_query(url, {self.offset_param: str(offset + len(records))})
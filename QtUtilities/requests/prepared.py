@@ -0,0 +1,113 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+__all__ = ['PreparedRequest']
+
+
+def _encode(value: typing.AnyStr) -> bytes:
+    """Encodes a header key or value, unless it's already bytes."""
+    return value if isinstance(value, bytes) else value.encode(encoding='UTF-8')
+
+
+def _quote(value: str) -> str:
+    """Percent-encodes every character of a query key or value that isn't
+    unreserved."""
+    return QtCore.QUrl.toPercentEncoding(value).data().decode(encoding='ascii')
+
+
+def _with_query(url: QtCore.QUrl, params: typing.Dict[str, str]) -> QtCore.QUrl:
+    """Returns a copy of `url` with `params` added to its query.  Params that
+    are already in the query are replaced in place, so the url stays stable.
+    
+    Params are percent-encoded here, since QUrlQuery leaves characters like
+    "+" and ";" as they are, which servers decode as form delimiters."""
+    url = QtCore.QUrl(url)
+    query = QtCore.QUrlQuery(url)
+    encoded = {_quote(k): _quote(v) for k, v in params.items()}
+    items = [(k, encoded.pop(k, v)) for k, v in query.queryItems(QtCore.QUrl.FullyEncoded)]
+    items.extend(encoded.items())
+    
+    query.setQueryItems(items)
+    url.setQuery(query)
+    
+    return url
+
+
+class PreparedRequest:
+    """A request template whose url, query, and headers are encoded once.
+    
+    Sending a prepared request through `Factory.send` only copies the
+    template's QNetworkRequest, which Qt shares until it's modified, so
+    requests sent many times skip rebuilding their url and re-encoding their
+    headers.  Params and headers passed to `build` override the template's
+    for a single request."""
+    __slots__ = ('op', '_request')
+    
+    def __init__(self, op: str, url: typing.Union[QtCore.QUrl, str], *,
+                 params: typing.Dict[str, str] = None,
+                 headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None):
+        # Instance attributes
+        self.op = op.upper()
+        
+        # Private attributes
+        self._request = QtNetwork.QNetworkRequest(_with_query(QtCore.QUrl(url), params or {}))
+        
+        for key, value in (headers or {}).items():
+            self._request.setRawHeader(_encode(key), _encode(value))
+    
+    # Properties
+    @property
+    def url(self) -> QtCore.QUrl:
+        """The url requests are sent to, including the template's params."""
+        return self._request.url()
+    
+    @property
+    def headers(self) -> typing.Dict[bytes, bytes]:
+        """The template's headers, as they're sent."""
+        return {k.data(): self._request.rawHeader(k).data() for k in self._request.rawHeaderList()}
+    
+    # Request methods
+    def build(self, *, params: typing.Dict[str, str] = None,
+              headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None) -> QtNetwork.QNetworkRequest:
+        """Returns a new QNetworkRequest from the template, with `params` and
+        `headers` overriding the template's."""
+        request = QtNetwork.QNetworkRequest(self._request)
+        
+        if params:
+            request.setUrl(_with_query(request.url(), params))
+        
+        if headers:
+            for key, value in headers.items():
+                request.setRawHeader(_encode(key), _encode(value))
+        
+        return request
+    
+    # Magic methods
+    def __repr__(self):
+        return f'<{self.__class__.__name__} op={self.op} url="{self.url.toDisplayString()}">'
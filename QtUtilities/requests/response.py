@@ -23,35 +23,59 @@
 # GNU Lesser General Public License along
 # with QtUtilities.  If not,
 # see <https://www.gnu.org/licenses/>.
-import dataclasses
-import functools
+import asyncio
+import copy
 import io
 import json
+import time
 import typing
 
 from PyQt5 import QtCore, QtNetwork
 
 from .. import signals
+from . import compression, jsonstream
+from .headers import Headers, parse_links
+from .metrics import Timings
 
 __all__ = ['Response']
 
+_UNSET = object()
+
 
-@dataclasses.dataclass(frozen=True)
 class Response:
     """The response from a factory request.  This alone does nothing without
     a QNetworkReply to populate itself."""
-    # Instance attributes
-    urls: typing.List[QtCore.QUrl] = dataclasses.field(init=False, default_factory=list)
-    params: typing.Dict[str, str] = dataclasses.field(init=False, default_factory=dict)
-    host: str = dataclasses.field(init=False, default_factory=str)
-    scheme: str = dataclasses.field(init=False, default_factory=str)
-    domain: str = dataclasses.field(init=False, default_factory=str)
-    port: int = dataclasses.field(init=False, default_factory=int)
-    cookies: typing.Dict[str, typing.Any] = dataclasses.field(init=False, default_factory=dict)
-    all_headers: typing.List[typing.Dict[str, str]] = dataclasses.field(init=False, default_factory=list)
-    code: int = dataclasses.field(init=False, default=QtNetwork.QNetworkReply.NoError)
-    error_string: str = dataclasses.field(init=False, default_factory=str)
-    raw_content: io.BytesIO = dataclasses.field(init=False, default_factory=io.BytesIO)
+    __slots__ = ('urls', 'all_headers', 'status', 'code', 'error_string', 'from_cache', 'timed_out', 'timings',
+                 'bytes_sent', 'bytes_received', '_cookies', '_body', '_text', '_json', '_decompress', '_decoder',
+                 '_reply')
+    
+    def __init__(self):
+        # Instance attributes
+        self.urls: typing.List[QtCore.QUrl] = []
+        self.all_headers: typing.List[Headers] = []
+        self.status: int = 0
+        self.code: int = QtNetwork.QNetworkReply.NoError
+        self.error_string: str = ''
+        self.from_cache: bool = False
+        self.timed_out: bool = False
+        
+        # Metric attributes
+        self.timings = Timings()
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+        
+        # Private attributes
+        self._cookies: typing.List[QtNetwork.QNetworkCookie] = []
+        
+        # Body attributes
+        self._body = QtCore.QByteArray()
+        self._text: typing.Optional[str] = None
+        self._json: typing.Any = _UNSET
+        self._decompress = False  # Whether the body must be decompressed here instead of by Qt
+        self._decoder: typing.Optional[compression.Codec] = None
+        
+        # Streaming attributes
+        self._reply: typing.Optional[QtNetwork.QNetworkReply] = None
     
     # Properties
     @property
@@ -65,106 +89,431 @@ class Response:
             return QtCore.QUrl()
     
     @property
-    def headers(self) -> typing.Dict[str, str]:
+    def params(self) -> typing.Dict[str, str]:
+        """The query items of the response's url."""
+        return dict(QtCore.QUrlQuery(self.url).queryItems(QtCore.QUrl.FullyDecoded))
+    
+    @property
+    def host(self) -> str:
+        """The host of the response's url."""
+        return self.url.host()
+    
+    @property
+    def scheme(self) -> str:
+        """The scheme of the response's url."""
+        return self.url.scheme()
+    
+    @property
+    def domain(self) -> str:
+        """The top-level domain of the response's url."""
+        return self.url.topLevelDomain()
+    
+    @property
+    def port(self) -> int:
+        """The port of the response's url, or -1 if it doesn't specify one."""
+        return self.url.port()
+    
+    @property
+    def cookies(self) -> typing.Dict[str, QtCore.QByteArray]:
+        """The cookies the manager's jar holds for the response's url."""
+        return {c.name().data().decode(): c.value() for c in self._cookies}
+    
+    @property
+    def headers(self) -> Headers:
         """The last headers the request obtained from the host.  If no headers
-        were received, an empty dict will be returned."""
+        were received, an empty mapping will be returned.  Header lookups are
+        case-insensitive."""
         try:
             return self.all_headers[-1]
         
         except IndexError:
-            return {}
+            return Headers()
+    
+    @property
+    def links(self) -> typing.Dict[str, QtCore.QUrl]:
+        """The targets of the response's `Link` header, keyed by their relation
+        types, and resolved against the response's url."""
+        links = {}
+        
+        for target, params in parse_links(self.headers.get('Link', '')):
+            for rel in params.get('rel', '').lower().split():
+                links.setdefault(rel, self.url.resolved(QtCore.QUrl(target)))
         
+        return links
+    
     @property
     def redirected(self) -> bool:
         """Whether or not the request was redirected."""
         return len(self.urls) > 1
     
     @property
-    def content(self):
-        """The raw content received from the request transformed into a string."""
-        self.raw_content.seek(0)
+    def streaming(self) -> bool:
+        """Whether or not the response's body is still being streamed from the
+        network."""
+        return self._reply is not None
+    
+    @property
+    def body(self) -> memoryview:
+        """A read-only view of the raw content received from the request.  The
+        view shares its memory with the reply's buffer, so no copy is made.
         
-        return self.raw_content.read().decode()
+        If the response is streaming, the remainder of the body will be read
+        from the network first."""
+        if self._reply is not None:
+            for chunk in self.iter_content():
+                self._body.append(chunk)
+        
+        return memoryview(self._body).toreadonly()
+    
+    @property
+    def raw_content(self) -> io.BytesIO:
+        """A copy of the raw content received from the request.  This exists for
+        compatibility; `body` should be preferred, as it doesn't copy."""
+        return io.BytesIO(self.body)
+    
+    @property
+    def encoding(self) -> str:
+        """The charset declared in the response's `Content-Type` header.  If no
+        charset was declared, UTF-8 is assumed."""
+        for parameter in self.headers.get('Content-Type', '').split(';')[1:]:
+            name, _, charset = parameter.partition('=')
+            
+            if name.strip().lower() == 'charset' and charset.strip():
+                return charset.strip().strip('"\'')
+        
+        return 'UTF-8'
+    
+    @property
+    def content(self) -> str:
+        """The raw content received from the request transformed into a string.
+        The content is only decoded once, with the response's encoding.
+        
+        If the response is streaming, the remainder of the body will be read
+        from the network first."""
+        if self._text is None:
+            body = self.body
+            
+            try:
+                text = str(body, self.encoding)
+            
+            except LookupError:
+                text = str(body, 'UTF-8')
+            
+            self._text = text
+        
+        return self._text
     
     # Internal methods
-    # noinspection PyUnresolvedReferences
     @classmethod
-    def from_reply(cls, reply: QtNetwork.QNetworkReply) -> 'Response':
-        """Slowly populates a new Response object with data from the request."""
+    def from_reply(cls, reply: QtNetwork.QNetworkReply, *, timeout: int = None) -> 'Response':
+        """Slowly populates a new Response object with data from the request.
+        
+        If `timeout` is passed, the reply will be aborted if it doesn't finish
+        within `timeout` milliseconds, and the response will be timed out."""
         r = cls()
+        r._bind(reply)
         
-        # Signal mapping
-        reply.metaDataChanged.connect(functools.partial(r._insert_headers, reply.rawHeaderPairs()))
-        reply.redirected.connect(r._insert_url)
-        reply.error.connect(r._update_code)
-        reply.error.connect(functools.partial(r._update_error_string, reply.errorString()))
+        # Wait until the request is finished before continuing
+        if not reply.isFinished():
+            signals.wait_for_signal(reply.finished, timeout=timeout)
+        
+        if not reply.isFinished():
+            r._time_out(timeout)
+            reply.abort()
+        
+        # Strip the remaining data from the reply, then mark it for deletion
+        r._finalize(reply)
+        
+        # Return the object
+        return r
+    
+    @classmethod
+    async def from_reply_async(cls, reply: QtNetwork.QNetworkReply, *, timeout: int = None) -> 'Response':
+        """Populates a new Response object with data from the request without
+        spinning a nested event loop.  See `from_reply` for `timeout`."""
+        r = cls()
+        r._bind(reply)
         
         # Wait until the request is finished before continuing
-        signals.wait_for_signal(reply.finished)
+        if not reply.isFinished():
+            try:
+                await signals.wait(reply.finished, timeout=timeout)
+            
+            except asyncio.TimeoutError:
+                r._time_out(timeout)
+                reply.abort()
         
         # Strip the remaining data from the reply, then mark it for deletion
-        r._from_reply(reply)
+        r._finalize(reply)
         
-        reply.close()
-        reply.deleteLater()
+        return r
+    
+    # noinspection PyUnresolvedReferences
+    def _bind(self, reply: QtNetwork.QNetworkReply):
+        """Maps the reply's signals to the Response object."""
+        self._insert_url(reply.request().url())
+        self.timings.sent = time.monotonic()
+        
+        # Signal mapping
+        # Slotted objects can't be weakly referenced, so bound methods can't be
+        # connected directly.
+        reply.metaDataChanged.connect(lambda: self._insert_headers(reply.rawHeaderPairs()))
+        reply.redirected.connect(lambda url: self._insert_url(url))
+        reply.error.connect(lambda code: self._update_code(code))
+        reply.error.connect(lambda _: self._update_error_string(reply.errorString()))
+        
+        # Metric mapping
+        reply.metaDataChanged.connect(lambda: self.timings._mark_first_byte())
+        reply.readyRead.connect(lambda: self.timings._mark_first_byte())
+        reply.redirected.connect(lambda _: self.timings.redirects.append(time.monotonic()))
+        reply.uploadProgress.connect(lambda sent, _: self._update_bytes_sent(sent))
+        reply.downloadProgress.connect(lambda received, _: self._update_bytes_received(received))
+    
+    def _finalize(self, reply: QtNetwork.QNetworkReply):
+        """Strips the remaining data from a finished reply, then marks the reply
+        for deletion.  Streaming replies are kept alive until their body has
+        been read."""
+        self.timings.finished = time.monotonic()
+        self._from_reply(reply)
+        
+        if self._reply is None:
+            reply.close()
+            reply.deleteLater()
+    
+    def _copy(self) -> 'Response':
+        """Creates a response for another caller from this finished one.  The
+        body's buffer is shared, since it's never modified, while the decoded
+        content and json aren't, so callers can't see each other's changes."""
+        r = self.__class__()
+        r.urls = list(self.urls)
+        r.all_headers = list(self.all_headers)
+        r.status = self.status
+        r.code = self.code
+        r.error_string = self.error_string
+        r.from_cache = self.from_cache
+        r.timed_out = self.timed_out
+        
+        r.timings = copy.copy(self.timings)
+        r.timings.redirects = list(self.timings.redirects)
+        r.bytes_sent = self.bytes_sent
+        r.bytes_received = self.bytes_received
+        
+        r._cookies = list(self._cookies)
+        r._body = self._body
         
-        # Return the object
         return r
     
+    def _stream(self, reply: QtNetwork.QNetworkReply):
+        """Marks the Response object as streaming its body from `reply`."""
+        self._reply = reply
+    
     def _from_reply(self, reply: QtNetwork.QNetworkReply):
         """Updates the Response object with the remaining data from the reply."""
-        # Read the reply's body
-        if reply.isReadable():
-            self.raw_content.seek(0)
-            self.raw_content.write(reply.readAll())
+        # Read the reply's body, unless it's being streamed
+        if reply.isReadable() and self._reply is None:
+            self._body = reply.readAll()
+            
+            if self._decompress:
+                self._body = QtCore.QByteArray(self._decode(self._body.data(), final=True))
         
-        # Store the cookies
-        manager: QtNetwork.QNetworkAccessManager = reply.manager()
-        jar: QtNetwork.QNetworkCookieJar = manager.cookieJar()
-        object.__setattr__(self, 'cookies', {c.name().data().decode(): c.value() for c in jar.allCookies()})
-    
-    def _insert_headers(self, headers: typing.List[typing.Tuple[QtCore.QByteArray, QtCore.QByteArray]]):
-        """Inserts the passed headers into the classes' header list."""
-        # Declarations
-        h = self.all_headers.copy()
+        # Store the HTTP status code, if the host sent one
+        self.status = reply.attribute(QtNetwork.QNetworkRequest.HttpStatusCodeAttribute) or 0
+        
+        # Store whether or not the body was loaded from the manager's cache
+        self.from_cache = bool(reply.attribute(QtNetwork.QNetworkRequest.SourceIsFromCacheAttribute))
         
-        # Append passed headers to header list
-        h.append({k.data().decode(): v.data().decode() for k, v in headers})
+        # Store the cookies, unless the reply didn't come from a manager
+        manager: typing.Optional[QtNetwork.QNetworkAccessManager] = reply.manager()
         
-        # Forcibly update the header list
-        object.__setattr__(self, 'all_headers', h)
+        if manager is not None:
+            # QNetworkCookieJar.allCookies is protected, so only the cookies
+            # applicable to the reply's url are available.
+            self._cookies = manager.cookieJar().cookiesForUrl(reply.url())
+    
+    def _insert_headers(self, headers: typing.List[typing.Tuple[QtCore.QByteArray, QtCore.QByteArray]]):
+        """Inserts the passed headers into the classes' header list.  The headers
+        aren't decoded until they're looked up."""
+        self.all_headers.append(Headers([(k.data(), v.data()) for k, v in headers]))
     
     def _insert_url(self, url: QtCore.QUrl):
         """Inserts the passed url into the classes' url list."""
-        # Declarations
-        u = self.urls.copy()
-        
-        # Append passed url to url list
-        u.append(url)
-        
-        # Forcible update the url list
-        object.__setattr__(self, 'urls', u)
+        self.urls.append(url)
     
     def _update_code(self, code: int):
-        """Updates the classes' code with the one passed."""
-        object.__setattr__(self, 'code', code)
+        """Updates the classes' code with the one passed.  Timed out responses
+        keep their code when their reply is aborted."""
+        if not self.timed_out:
+            self.code = code
     
     def _update_error_string(self, string: str):
         """Updates the classes' error string with the one passed."""
-        object.__setattr__(self, 'error_string', string)
+        if not self.timed_out:
+            self.error_string = string
+    
+    def _time_out(self, timeout: int):
+        """Marks the response as timed out after `timeout` milliseconds."""
+        self.code = QtNetwork.QNetworkReply.TimeoutError
+        self.error_string = f'Request timed out after {timeout}ms'
+        self.timed_out = True
+    
+    def _update_bytes_sent(self, sent: int):
+        """Updates the amount of bytes the request has sent.  Qt reports zero
+        bytes once the upload finishes, so zeroes are ignored."""
+        if sent > 0:
+            self.bytes_sent = sent
+    
+    def _update_bytes_received(self, received: int):
+        """Updates the amount of bytes the response has received."""
+        if received > 0:
+            self.bytes_received = received
+    
+    def _decode(self, data: bytes, *, final: bool = False) -> bytes:
+        """Decompresses a chunk of the body, if the factory asked for an
+        encoding Qt doesn't decompress itself."""
+        if not self._decompress:
+            return data
+        
+        if self._decoder is None:
+            self._decoder = compression.decompressor(self.headers.get('Content-Encoding', ''))
+        
+        data = self._decoder.feed(data) if data else b''
+        
+        if final:
+            data += self._decoder.flush()
+            
+            # The whole body has been decompressed
+            self._decompress = False
+        
+        return data
+    
+    # Streaming methods
+    def iter_content(self, chunk_size: int = 8192) -> typing.Iterator[bytes]:
+        """Yields the response's body in chunks of at most `chunk_size` bytes.
+        
+        If the response is streaming, chunks are read from the network as they
+        arrive, waiting on a nested event loop whenever no data is available.
+        Streamed chunks are not stored in `body`."""
+        reply = self._reply
+        
+        if reply is None:
+            body = self.body
+            
+            for offset in range(0, len(body), chunk_size):
+                yield body[offset:offset + chunk_size].tobytes()
+            
+            return
+        
+        # Declarations
+        loop = QtCore.QEventLoop()
+        
+        reply.readyRead.connect(loop.quit)
+        reply.finished.connect(loop.quit)
+        
+        try:
+            while True:
+                if reply.bytesAvailable() > 0:
+                    chunk = self._decode(reply.read(chunk_size))
+                    
+                    if chunk:
+                        yield chunk
+                
+                elif reply.isFinished():
+                    chunk = self._decode(b'', final=True)
+                    
+                    if chunk:
+                        yield chunk
+                    
+                    break
+                
+                else:
+                    loop.exec()
+        
+        finally:
+            reply.readyRead.disconnect(loop.quit)
+            reply.finished.disconnect(loop.quit)
+            loop.deleteLater()
+        
+        self.close()
+    
+    def iter_lines(self, chunk_size: int = 8192, delimiter: bytes = None) -> typing.Iterator[bytes]:
+        """Yields the response's body one line at a time.  Lines are split on
+        `delimiter`, or on universal newlines if no delimiter was passed."""
+        pending = b''
+        
+        for chunk in self.iter_content(chunk_size):
+            pending += chunk
+            lines = pending.split(delimiter) if delimiter is not None else pending.splitlines(keepends=True)
+            
+            # The last line may be incomplete, so it's held until the next chunk
+            pending = lines.pop() if lines else b''
+            
+            for line in lines:
+                yield line if delimiter is not None else line.rstrip(b'\r\n')
+        
+        if pending:
+            yield pending if delimiter is not None else pending.rstrip(b'\r\n')
+    
+    def close(self):
+        """Releases a streaming response's reply.  If the reply hasn't finished,
+        it will be aborted."""
+        reply = self._reply
+        
+        if reply is None:
+            return
+        
+        self._reply = None
+        
+        # Replies that already failed can't be aborted again
+        if not reply.isFinished() and reply.error() == QtNetwork.QNetworkReply.NoError:
+            reply.abort()
+        
+        reply.close()
+        reply.deleteLater()
     
     # Utility methods
     def is_okay(self) -> bool:
         """Whether or not the request was successful."""
         return self.code == QtNetwork.QNetworkReply.NoError
     
-    def json(self, encoder: typing.Callable[[str], dict] = None) -> dict:
-        """Converts the reply's body into a JSON object."""
-        if encoder is None:
-            encoder = json.loads
+    def json(self, encoder: typing.Callable[[typing.Union[str, memoryview]], typing.Any] = None, *,
+             binary: bool = False) -> typing.Any:
+        """Converts the reply's body into a JSON object.
         
-        return encoder(self.content)
+        If `binary` is True, `encoder` will be passed the raw body instead of
+        the decoded content, which allows decoders like orjson to skip decoding
+        the body into a string, ie. `response.json(orjson.loads, binary=True)`.
+        When the default decoder is used, the body is only parsed once, and the
+        same object is returned on later calls."""
+        if encoder is not None:
+            return encoder(self.body if binary else self.content)
+        
+        if self._json is _UNSET:
+            content = self.content
+            
+            # Byte order marks are allowed in JSON bodies, but not in the
+            # strings `json.loads` is given.
+            if content.startswith('\ufeff'):
+                content = content[1:]
+            
+            self._json = json.loads(content)
+        
+        return self._json
+    
+    def iter_json_items(self, path: str = '', *, chunk_size: int = 65536) -> typing.Iterator[typing.Any]:
+        """Yields the elements of a JSON array within the body as they're parsed.
+        
+        `path` is a dot separated list of object keys leading to the array, or
+        an empty string if the body itself is the array.  If the response is
+        streaming, elements are yielded as they arrive from the network, so the
+        whole document never has to be held in memory."""
+        return jsonstream.iter_items(self.iter_content(chunk_size), path, encoding=self.encoding)
     
     # Magic methods
+    def __enter__(self) -> 'Response':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
     def __repr__(self):
-        return f'<{self.__class__.__name__} url="{self.url.toDisplayString()}" code={self.code}>'
+        return f'<{self.__class__.__name__} url="{self.url.toDisplayString()}" status={self.status} code={self.code}>'
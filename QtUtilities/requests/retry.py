@@ -0,0 +1,126 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import dataclasses
+import email.utils
+import random
+import time
+import typing
+
+from PyQt5 import QtNetwork
+
+if typing.TYPE_CHECKING:
+    from .response import Response
+
+__all__ = ['RetryPolicy']
+
+_MAX_DELAY = (2 ** 31 - 1) / 1000  # QTimer intervals are signed 32-bit amounts of milliseconds
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    """Describes when, and how long after, a failed request should be sent
+    again.
+    
+    The delay between attempts grows exponentially from `backoff` seconds, up
+    to `max_backoff` seconds.  If `jitter` is True, each delay is randomized
+    between 0 and its full value, so clients don't retry in lockstep.  A
+    `Retry-After` header from the host takes precedence over the backoff, but
+    requests whose host asks for a longer wait than `max_backoff` aren't
+    retried."""
+    max_attempts: int = 3
+    statuses: typing.FrozenSet[int] = frozenset({408, 429, 500, 502, 503, 504})
+    errors: typing.FrozenSet[int] = frozenset({
+        QtNetwork.QNetworkReply.ConnectionRefusedError,
+        QtNetwork.QNetworkReply.RemoteHostClosedError,
+        QtNetwork.QNetworkReply.TimeoutError,
+        QtNetwork.QNetworkReply.TemporaryNetworkFailureError,
+        QtNetwork.QNetworkReply.NetworkSessionFailedError,
+        QtNetwork.QNetworkReply.ProxyConnectionRefusedError,
+        QtNetwork.QNetworkReply.ProxyConnectionClosedError,
+        QtNetwork.QNetworkReply.ProxyTimeoutError,
+        QtNetwork.QNetworkReply.UnknownNetworkError
+    })
+    methods: typing.FrozenSet[str] = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+    backoff: float = 0.5
+    max_backoff: float = 30
+    jitter: bool = True
+    respect_retry_after: bool = True
+    
+    # Policy methods
+    def should_retry(self, op: str, response: 'Response', attempt: int) -> bool:
+        """Whether or not a request should be sent again after `attempt`
+        attempts produced `response`."""
+        if attempt >= self.max_attempts or op.upper() not in self.methods:
+            return False
+        
+        if self.respect_retry_after:
+            retry_after = self.retry_after(response)
+            
+            if retry_after is not None and retry_after > self.max_backoff:
+                return False
+        
+        if response.status in self.statuses:
+            return True
+        
+        # Responses with a status were received from the host, so their error
+        # codes only mirror the status.
+        return response.status == 0 and response.code in self.errors
+    
+    def delay(self, attempt: int, response: 'Response' = None) -> float:
+        """The amount of seconds to wait before sending attempt `attempt + 1`.
+        Delays never exceed `max_backoff`, or what a QTimer can wait."""
+        if self.respect_retry_after and response is not None:
+            retry_after = self.retry_after(response)
+            
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff, _MAX_DELAY)
+        
+        delay = min(self.max_backoff, _MAX_DELAY, self.backoff * 2 ** (attempt - 1))
+        
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        
+        return delay
+    
+    @staticmethod
+    def retry_after(response: 'Response') -> typing.Optional[float]:
+        """Parses the response's `Retry-After` header into an amount of seconds.
+        If the header is missing or malformed, None will be returned."""
+        value = response.headers.get('Retry-After', '').strip()
+        
+        if not value:
+            return None
+        
+        if value.isdigit():
+            return float(value)
+        
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        
+        except (TypeError, ValueError):
+            return None
+        
+        return max(0.0, when.timestamp() - time.time())
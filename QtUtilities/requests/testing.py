@@ -0,0 +1,472 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import dataclasses
+import http.server
+import random
+import threading
+import time
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+from .transport import Transport
+
+__all__ = ['CannedResponse', 'FakeReply', 'FakeTransport', 'LocalServer', 'SentRequest']
+
+SentRequest = typing.NamedTuple('SentRequest', [('op', str), ('url', str), ('headers', typing.Dict[str, str]),
+                                                ('body', bytes)])
+
+_OPERATIONS = {
+    'GET': QtNetwork.QNetworkAccessManager.GetOperation,
+    'HEAD': QtNetwork.QNetworkAccessManager.HeadOperation,
+    'PUT': QtNetwork.QNetworkAccessManager.PutOperation,
+    'POST': QtNetwork.QNetworkAccessManager.PostOperation,
+    'DELETE': QtNetwork.QNetworkAccessManager.DeleteOperation
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CannedResponse:
+    """A response served by a FakeTransport or a LocalServer.
+    
+    If `error` is passed, the request fails with that QNetworkReply error
+    after the body has been sent, or without a response at all if `status`
+    is 0.  `latency` is the amount of seconds to wait before responding, and
+    overrides the transport's latency when passed."""
+    status: int = 200
+    body: bytes = b''
+    headers: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    reason: str = ''
+    error: typing.Optional[int] = None
+    latency: typing.Optional[float] = None
+
+
+class FakeReply(QtNetwork.QNetworkReply):
+    """A reply served from a canned response without a network.
+    
+    The response arrives after `latency` seconds, and its body is delivered at
+    `throughput` bytes per second, or all at once if no throughput is given.
+    `sent` is the size of the request's body, which is reported as uploaded
+    once the response arrives."""
+    TICK = 10  # The amount of milliseconds between body deliveries.
+    
+    def __init__(self, op: str, request: QtNetwork.QNetworkRequest, canned: CannedResponse, *,
+                 latency: float = 0, throughput: float = None, sent: int = 0, parent: QtCore.QObject = None):
+        # Super call
+        super(FakeReply, self).__init__(parent)
+        
+        # Private attributes
+        self._canned = canned
+        self._throughput = throughput
+        self._sent = sent
+        self._delivered = 0
+        self._read = 0
+        self._timer = QtCore.QTimer(self)
+        
+        # Reply stitching
+        self.setRequest(request)
+        self.setUrl(request.url())
+        self.setOperation(_OPERATIONS.get(op, QtNetwork.QNetworkAccessManager.CustomOperation))
+        self.open(QtCore.QIODevice.ReadOnly | QtCore.QIODevice.Unbuffered)
+        
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._respond)
+        self._timer.start(int((canned.latency if canned.latency is not None else latency) * 1000))
+    
+    # Device methods
+    def isSequential(self) -> bool:
+        return True
+    
+    def bytesAvailable(self) -> int:
+        return self._delivered - self._read + super(FakeReply, self).bytesAvailable()
+    
+    def readData(self, max_size: int) -> bytes:
+        end = min(self._read + max_size, self._delivered)
+        data = self._canned.body[self._read:end]
+        self._read = end
+        
+        return data
+    
+    def abort(self):
+        if self.isFinished():
+            return
+        
+        self._timer.stop()
+        self._fail(QtNetwork.QNetworkReply.OperationCanceledError, 'Operation canceled')
+    
+    # Internal methods
+    def _respond(self):
+        """Sends the canned response's status and headers, then starts
+        delivering its body."""
+        canned = self._canned
+        
+        if self._sent > 0:
+            self.uploadProgress.emit(self._sent, self._sent)
+        
+        if canned.status == 0:
+            self._fail(canned.error or QtNetwork.QNetworkReply.RemoteHostClosedError, 'Connection closed')
+            
+            return
+        
+        self.setAttribute(QtNetwork.QNetworkRequest.HttpStatusCodeAttribute, canned.status)
+        self.setAttribute(QtNetwork.QNetworkRequest.HttpReasonPhraseAttribute, canned.reason.encode())
+        self.setRawHeader(b'Content-Length', str(len(canned.body)).encode())
+        
+        for key, value in canned.headers.items():
+            self.setRawHeader(key.encode(encoding='UTF-8'), value.encode(encoding='UTF-8'))
+        
+        self.metaDataChanged.emit()
+        
+        self._timer.timeout.disconnect(self._respond)
+        self._timer.timeout.connect(self._deliver)
+        self._timer.setSingleShot(False)
+        self._deliver()
+    
+    def _deliver(self):
+        """Delivers the next part of the body, and finishes the reply once the
+        whole body has been delivered."""
+        total = len(self._canned.body)
+        
+        if self._throughput is None:
+            self._delivered = total
+        
+        else:
+            self._delivered = min(total, self._delivered + max(1, int(self._throughput * self.TICK / 1000)))
+        
+        if total > 0:
+            self.readyRead.emit()
+            self.downloadProgress.emit(self._delivered, total)
+        
+        if self._delivered < total:
+            if not self._timer.isActive():
+                self._timer.start(self.TICK)
+            
+            return
+        
+        self._timer.stop()
+        
+        message = f'Server replied: {self._canned.reason or self._canned.status}'
+        
+        if self._canned.error is not None:
+            self._fail(self._canned.error, message)
+        
+        elif self._canned.status >= 400:
+            self._fail(_status_error(self._canned.status), message)
+        
+        else:
+            self._finish()
+    
+    def _fail(self, code: int, message: str):
+        """Finishes the reply with an error."""
+        self.setError(code, message)
+        self.error.emit(code)
+        self._finish()
+    
+    def _finish(self):
+        """Marks the reply as finished."""
+        self.setFinished(True)
+        self.finished.emit()
+
+
+def _status_error(status: int) -> int:
+    """Returns the QNetworkReply error Qt reports for an HTTP error status."""
+    errors = {
+        401: QtNetwork.QNetworkReply.AuthenticationRequiredError,
+        403: QtNetwork.QNetworkReply.ContentAccessDenied,
+        404: QtNetwork.QNetworkReply.ContentNotFoundError,
+        405: QtNetwork.QNetworkReply.ContentOperationNotPermittedError,
+        407: QtNetwork.QNetworkReply.ProxyAuthenticationRequiredError,
+        409: QtNetwork.QNetworkReply.ContentConflictError,
+        410: QtNetwork.QNetworkReply.ContentGoneError,
+        418: QtNetwork.QNetworkReply.ProtocolInvalidOperationError,
+        500: QtNetwork.QNetworkReply.InternalServerError,
+        501: QtNetwork.QNetworkReply.OperationNotImplementedError,
+        503: QtNetwork.QNetworkReply.ServiceUnavailableError
+    }
+    
+    if status in errors:
+        return errors[status]
+    
+    return QtNetwork.QNetworkReply.UnknownContentError if status < 500 else QtNetwork.QNetworkReply.UnknownServerError
+
+
+class FakeTransport(Transport):
+    """A deterministic, in-process transport for testing and benchmarking.
+    
+    Requests are answered with the canned responses registered through
+    `add`, after `latency` seconds and at `throughput` bytes per second.  If
+    `error_rate` is passed, that fraction of requests fail with `error`
+    instead, chosen by a random generator seeded with `seed`.  Every request
+    sent is recorded in `requests`."""
+    
+    def __init__(self, *, latency: float = 0, throughput: float = None, error_rate: float = 0,
+                 error: int = QtNetwork.QNetworkReply.RemoteHostClosedError, seed: int = None,
+                 parent: QtCore.QObject = None):
+        # Super call
+        super(FakeTransport, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.latency = latency
+        self.throughput = throughput
+        self.error_rate = error_rate
+        self.error = error
+        self.requests: typing.List[SentRequest] = []
+        
+        # Private attributes
+        self._random = random.Random(seed)
+        self._routes: typing.Dict[typing.Tuple[str, str], typing.List[CannedResponse]] = {}
+    
+    # Route methods
+    def add(self, url: typing.Union[QtCore.QUrl, str], response: CannedResponse = None, *, op: str = 'GET',
+            **kwargs):
+        """Registers a canned response for requests to `url`.
+        
+        `url` may be a full url, or a path that matches any host.  If a route
+        has more than one response, they're served in order, and the last one
+        is repeated.  Keyword arguments are passed to CannedResponse if a
+        response isn't passed."""
+        if response is None:
+            response = CannedResponse(**kwargs)
+        
+        self._routes.setdefault((op.upper(), self._key(url)), []).append(response)
+    
+    def clear(self):
+        """Removes every route, and forgets the recorded requests."""
+        self._routes.clear()
+        self.requests.clear()
+    
+    # Transport methods
+    def send(self, op: str, request: QtNetwork.QNetworkRequest, data: typing.Any = None) -> FakeReply:
+        # Request recording
+        body = b''
+        
+        if isinstance(data, QtCore.QIODevice):
+            position = data.pos()
+            body = data.readAll().data()
+            
+            # Random-access bodies are left as they were, so they can be resent
+            if not data.isSequential():
+                data.seek(position)
+        
+        headers = {k.data().decode(): request.rawHeader(k).data().decode() for k in request.rawHeaderList()}
+        
+        self.requests.append(SentRequest(op, request.url().toString(), headers, body))
+        
+        # Response selection
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            canned = CannedResponse(status=0, error=self.error)
+        
+        else:
+            canned = self._lookup(op, request.url())
+        
+        return FakeReply(op, request, canned, latency=self.latency, throughput=self.throughput, sent=len(body),
+                         parent=self)
+    
+    # Internal methods
+    @staticmethod
+    def _key(url: typing.Union[QtCore.QUrl, str]) -> str:
+        """Converts a route's url into the key it's stored under."""
+        if isinstance(url, str):
+            url = QtCore.QUrl(url)
+        
+        return url.toString(QtCore.QUrl.RemoveFragment) if url.host() else url.path()
+    
+    def _lookup(self, op: str, url: QtCore.QUrl) -> CannedResponse:
+        """Returns the next canned response for a request, or a 404 if no route
+        matches it."""
+        for key in (url.toString(QtCore.QUrl.RemoveFragment), url.toString(QtCore.QUrl.RemoveFragment |
+                                                                           QtCore.QUrl.RemoveQuery), url.path()):
+            responses = self._routes.get((op.upper(), key))
+            
+            if responses:
+                return responses.pop(0) if len(responses) > 1 else responses[0]
+        
+        return CannedResponse(status=404, reason='Not Found')
+
+
+class LocalServer:
+    """Serves canned responses from an `http.server` on a background thread.
+    
+    Routes map paths to canned responses, or to callables that are passed the
+    handler and return one.  This allows a factory's real transport to be
+    exercised without leaving the machine.  Responses with an
+    `Accept-Ranges: bytes` header also answer single byte range requests."""
+    
+    def __init__(self, routes: typing.Dict[str, typing.Union[CannedResponse, typing.Callable]] = None, *,
+                 host: str = '127.0.0.1', port: int = 0):
+        # Public attributes
+        self.routes = dict(routes or {})
+        
+        # Private attributes
+        self._address = (host, port)
+        self._server: typing.Optional[http.server.ThreadingHTTPServer] = None
+        self._thread: typing.Optional[threading.Thread] = None
+    
+    # Properties
+    @property
+    def base_url(self) -> str:
+        """The url the server is listening on."""
+        host, port = self._server.server_address[:2]
+        
+        return f'http://{host}:{port}'
+    
+    # Server methods
+    def start(self) -> 'LocalServer':
+        """Starts serving requests on a daemon thread."""
+        server = self
+        
+        class Handler(_Handler):
+            def route(self) -> typing.Optional[typing.Union[CannedResponse, typing.Callable]]:
+                return server.routes.get(self.path.partition('?')[0])
+        
+        self._server = http.server.ThreadingHTTPServer(self._address, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='LocalServer', daemon=True)
+        self._thread.start()
+        
+        return self
+    
+    def stop(self):
+        """Stops serving requests."""
+        if self._server is None:
+            return
+        
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        
+        self._server = None
+        self._thread = None
+    
+    def url(self, path: str) -> str:
+        """Returns the full url of a path on the server."""
+        return self.base_url + path
+    
+    # Magic methods
+    def __enter__(self) -> 'LocalServer':
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Answers requests with a LocalServer's canned responses."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and bodies are written separately
+    
+    def route(self) -> typing.Optional[typing.Union[CannedResponse, typing.Callable]]:
+        """Returns the route matching the request."""
+        raise NotImplementedError
+    
+    def log_message(self, *args):
+        pass
+    
+    def handle_one_request(self):
+        # Every verb is answered the same way
+        self.raw_requestline = self.rfile.readline(65537)
+        
+        if not self.raw_requestline:
+            self.close_connection = True
+            
+            return
+        
+        if not self.parse_request():
+            return
+        
+        self.respond()
+    
+    def respond(self):
+        """Reads the request's body, then sends the route's response."""
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length > 0 else b''
+        
+        route = self.route()
+        canned = route(self) if callable(route) else route
+        
+        if canned is None:
+            canned = CannedResponse(status=404, reason='Not Found')
+        
+        if canned.latency:
+            time.sleep(canned.latency)
+        
+        if canned.status == 0:
+            # Simulates the host dropping the connection
+            self.close_connection = True
+            
+            return
+        
+        status, reason, body = canned.status, canned.reason or None, canned.body
+        headers = dict(canned.headers)
+        requested = self._range(canned)
+        
+        if requested is not None:
+            start, stop = requested
+            status, reason, body = 206, None, body[start:stop]
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{len(canned.body)}'
+        
+        self.send_response(status, reason)
+        
+        for key, value in headers.items():
+            self.send_header(key, value)
+        
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        
+        self.end_headers()
+        
+        if self.command != 'HEAD' and body:
+            try:
+                self.wfile.write(body)
+            
+            except ConnectionError:
+                # The client aborted the request
+                self.close_connection = True
+    
+    def _range(self, canned: CannedResponse) -> typing.Optional[typing.Tuple[int, int]]:
+        """Returns the single byte range the request asked for, if the canned
+        response accepts byte ranges and its `If-Range` validator matches."""
+        value = self.headers.get('Range', '')
+        
+        if canned.status != 200 or canned.headers.get('Accept-Ranges') != 'bytes' or not value.startswith('bytes='):
+            return None
+        
+        validator = self.headers.get('If-Range')
+        
+        if validator is not None and validator not in (canned.headers.get('ETag'), canned.headers.get('Last-Modified')):
+            return None
+        
+        first, _, last = value[6:].partition('-')
+        length = len(canned.body)
+        
+        try:
+            if not first:
+                return max(0, length - int(last)), length
+            
+            return int(first), min(length, int(last) + 1 if last else length)
+        
+        except ValueError:
+            return None
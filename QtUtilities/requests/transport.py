@@ -0,0 +1,73 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+__all__ = ['ManagerTransport', 'Transport']
+
+
+class Transport(QtCore.QObject):
+    """The interface factories send requests through.
+    
+    A transport turns a request into a QNetworkReply.  The reply doesn't have
+    to come from a QNetworkAccessManager, but it must emit the usual reply
+    signals, so subclasses can serve requests from anywhere."""
+    
+    def send(self, op: str, request: QtNetwork.QNetworkRequest, data: typing.Any = None) -> QtNetwork.QNetworkReply:
+        """Sends a request, and returns its reply.
+        
+        `data` is an open QIODevice, a QHttpMultiPart, or None."""
+        raise NotImplementedError
+
+
+class ManagerTransport(Transport):
+    """The default transport, which sends requests through a
+    QNetworkAccessManager."""
+    
+    def __init__(self, manager: QtNetwork.QNetworkAccessManager, *, parent: QtCore.QObject = None):
+        # Super call
+        super(ManagerTransport, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.manager = manager
+    
+    def send(self, op: str, request: QtNetwork.QNetworkRequest, data: typing.Any = None) -> QtNetwork.QNetworkReply:
+        """Sends a request through the transport's manager.
+        
+        QNetworkAccessManager only consults its cache for operations issued
+        through its dedicated methods, so standard verbs aren't sent through
+        `sendCustomRequest`."""
+        if op == 'GET' and data is None:
+            return self.manager.get(request)
+        
+        elif op == 'HEAD' and data is None:
+            return self.manager.head(request)
+        
+        elif op == 'DELETE' and data is None:
+            return self.manager.deleteResource(request)
+        
+        return self.manager.sendCustomRequest(request, op.encode(encoding='UTF-8'), data)
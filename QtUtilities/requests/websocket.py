@@ -0,0 +1,392 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import asyncio
+import collections
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+from .events import _Inbox
+from .prepared import _encode
+from .retry import RetryPolicy
+
+try:
+    from PyQt5 import QtWebSockets
+except ImportError:
+    QtWebSockets = None
+
+__all__ = ['WebSocket', 'WebSocketPool']
+
+Message = typing.Union[str, memoryview]
+
+
+class _Connection(QtCore.QObject):
+    """A socket shared by every handle a pool opened for its url."""
+    connected = QtCore.pyqtSignal()
+    disconnected = QtCore.pyqtSignal()
+    closed = QtCore.pyqtSignal()
+    text_received = QtCore.pyqtSignal(str)
+    binary_received = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(int, str)
+    
+    def __init__(self, pool: 'WebSocketPool', key: str, request: QtNetwork.QNetworkRequest):
+        # Super call
+        super(_Connection, self).__init__(parent=pool)
+        
+        # Public attributes
+        self.key = key
+        self.request = request
+        self.handles: typing.List['WebSocket'] = []
+        
+        # Private attributes
+        self._pool = pool
+        self._socket = QtWebSockets.QWebSocket(parent=self)
+        self._queue: typing.Deque[typing.Union[str, QtCore.QByteArray]] = collections.deque(maxlen=pool.max_queued)
+        self._attempt = 0
+        self._closing = False
+        self._reconnect_timer = QtCore.QTimer(self)
+        self._flush_timer = QtCore.QTimer(self)
+        
+        # Signal mapping
+        self._socket.connected.connect(self._on_connected)
+        self._socket.disconnected.connect(self._on_disconnected)
+        self._socket.textMessageReceived.connect(self.text_received)
+        self._socket.binaryMessageReceived.connect(self._on_binary)
+        self._socket.error.connect(self._on_error)
+        
+        self._reconnect_timer.setSingleShot(True)
+        self._reconnect_timer.timeout.connect(self.open)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+    
+    # Properties
+    @property
+    def is_connected(self) -> bool:
+        return self._socket.state() == QtNetwork.QAbstractSocket.ConnectedState
+    
+    # Connection methods
+    def open(self):
+        """Opens the socket."""
+        if not self._closing:
+            self._socket.open(self.request)
+    
+    def close(self):
+        """Closes the socket for good."""
+        if self._closing:
+            return
+        
+        self._closing = True
+        self._reconnect_timer.stop()
+        self._flush_timer.stop()
+        
+        if self._socket.state() == QtNetwork.QAbstractSocket.UnconnectedState:
+            self._on_disconnected()
+        
+        else:
+            self._socket.close()
+    
+    def release(self, handle: 'WebSocket'):
+        """Forgets a closed handle, and closes the socket once no handles are
+        left."""
+        if handle in self.handles:
+            self.handles.remove(handle)
+        
+        if not self.handles:
+            self.close()
+    
+    # Message methods
+    def send(self, message: typing.Union[str, QtCore.QByteArray]):
+        """Queues a message, which is sent with the rest of its batch."""
+        self._queue.append(message)
+        
+        if self.is_connected and not self._flush_timer.isActive():
+            self._flush_timer.start(self._pool.batch_interval)
+    
+    def flush(self):
+        """Sends every queued message, then writes them to the network at
+        once."""
+        self._flush_timer.stop()
+        
+        if not self.is_connected:
+            return
+        
+        while self._queue:
+            message = self._queue.popleft()
+            
+            if isinstance(message, str):
+                self._socket.sendTextMessage(message)
+            
+            else:
+                self._socket.sendBinaryMessage(message)
+        
+        self._socket.flush()
+    
+    # Internal methods
+    def _on_connected(self):
+        self._attempt = 0
+        self.connected.emit()
+        
+        # Messages sent while the socket was down are sent first
+        if self._queue:
+            self.flush()
+    
+    def _on_disconnected(self):
+        if self._closing:
+            self._pool._forget(self)
+            self.closed.emit()
+            self.deleteLater()
+            
+            return
+        
+        self.disconnected.emit()
+        self._attempt += 1
+        
+        if self._attempt >= self._pool.reconnect.max_attempts:
+            self.close()
+        
+        else:
+            self._reconnect_timer.start(int(self._pool.reconnect.delay(self._attempt) * 1000))
+    
+    def _on_binary(self, message: QtCore.QByteArray):
+        # The view shares the message's memory, so it isn't copied
+        self.binary_received.emit(memoryview(message).toreadonly())
+    
+    def _on_error(self, code: int):
+        self.error.emit(code, self._socket.errorString())
+
+
+class WebSocket(QtCore.QObject):
+    """A handle on a pooled WebSocket connection.
+    
+    Handles opened for the same url share a single socket.  Every handle
+    receives every message the socket receives, and messages sent through
+    any handle are queued and sent in batches.  Text messages are received as
+    strings, and binary messages as read-only memoryviews over Qt's buffer.
+    Messages can also be iterated over with `async for`."""
+    connected = QtCore.pyqtSignal()  # Emitted whenever the socket connects.
+    disconnected = QtCore.pyqtSignal()  # Emitted whenever the socket disconnects, before it reconnects.
+    closed = QtCore.pyqtSignal()  # Emitted once the handle, or the socket, is closed for good.
+    text_received = QtCore.pyqtSignal(str)
+    binary_received = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(int, str)  # Emitted with the socket error and its message.
+    
+    def __init__(self, connection: _Connection, *, parent: QtCore.QObject = None):
+        # Super call
+        super(WebSocket, self).__init__(parent=parent)
+        
+        # Private attributes
+        self._connection: typing.Optional[_Connection] = connection
+        
+        # Signal mapping
+        for name in ('connected', 'disconnected', 'text_received', 'binary_received', 'error'):
+            getattr(connection, name).connect(getattr(self, name))
+        
+        connection.closed.connect(self._on_closed)
+        connection.handles.append(self)
+    
+    # Properties
+    @property
+    def url(self) -> QtCore.QUrl:
+        """The url of the socket, or an empty QUrl if the handle is closed."""
+        return QtCore.QUrl() if self._connection is None else self._connection.request.url()
+    
+    @property
+    def is_connected(self) -> bool:
+        """Whether or not the socket is currently connected."""
+        return self._connection is not None and self._connection.is_connected
+    
+    @property
+    def is_closed(self) -> bool:
+        """Whether or not the handle was closed."""
+        return self._connection is None
+    
+    # Message methods
+    def send_text(self, message: str):
+        """Queues a text message.
+        
+        :raises RuntimeError: The handle was closed."""
+        self._checked().send(message)
+    
+    def send_binary(self, message: typing.Union[bytes, bytearray, memoryview, QtCore.QByteArray]):
+        """Queues a binary message.  QByteArrays are sent as they are, while
+        other buffers are copied into one.
+        
+        :raises RuntimeError: The handle was closed."""
+        self._checked().send(message if isinstance(message, QtCore.QByteArray) else QtCore.QByteArray(bytes(message)))
+    
+    def flush(self):
+        """Sends the queued messages now, instead of waiting for the batch."""
+        self._checked().flush()
+    
+    def close(self):
+        """Closes the handle.  The socket is closed once every handle sharing it
+        has been closed."""
+        connection, self._connection = self._connection, None
+        
+        if connection is None:
+            return
+        
+        for name in ('connected', 'disconnected', 'text_received', 'binary_received', 'error'):
+            getattr(connection, name).disconnect(getattr(self, name))
+        
+        connection.closed.disconnect(self._on_closed)
+        connection.release(self)
+        
+        self.closed.emit()
+    
+    # Internal methods
+    def _checked(self) -> _Connection:
+        """Returns the handle's connection.
+        
+        :raises RuntimeError: The handle was closed."""
+        if self._connection is None:
+            raise RuntimeError('The WebSocket was closed!')
+        
+        return self._connection
+    
+    def _on_closed(self):
+        """Closes the handle after the socket gave up reconnecting."""
+        self._connection = None
+        self.closed.emit()
+    
+    # Magic methods
+    async def __aiter__(self) -> typing.AsyncIterator[Message]:
+        """Yields messages as they're received, until the handle is closed."""
+        # Declarations
+        messages: asyncio.Queue = asyncio.Queue()
+        inbox = _Inbox(messages)
+        
+        # The inbox's slot only accepts objects, so text is passed through
+        def put_text(message: str):
+            inbox.put(message)
+        
+        self.text_received.connect(put_text)
+        self.binary_received.connect(inbox.put)
+        self.closed.connect(inbox.close)
+        
+        try:
+            if self._connection is None:
+                return
+            
+            while True:
+                message = await messages.get()
+                
+                if message is None:
+                    return
+                
+                yield message
+        
+        finally:
+            self.text_received.disconnect(put_text)
+            self.binary_received.disconnect(inbox.put)
+            self.closed.disconnect(inbox.close)
+            inbox.deleteLater()
+    
+    def __enter__(self) -> 'WebSocket':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    async def __aenter__(self) -> 'WebSocket':
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __repr__(self):
+        state = 'closed' if self.is_closed else 'connected' if self.is_connected else 'connecting'
+        
+        return f'<{self.__class__.__name__} url="{self.url.toDisplayString()}" state={state}>'
+
+
+class WebSocketPool(QtCore.QObject):
+    """Shares WebSocket connections between the parts of an application.
+    
+    `open` returns a handle on the pool's connection for a url, connecting it
+    if there isn't one, so panels talking to the same backend share a single
+    socket.  Dropped connections are reconnected after the delays of the
+    `reconnect` policy, until it runs out of attempts.  Messages are queued
+    while a socket is down, up to `max_queued` messages, after which the
+    oldest are dropped.  Queued messages are sent in batches, `batch_interval`
+    milliseconds after the first message of the batch.
+    
+    :raises RuntimeError: QtWebSockets isn't installed."""
+    
+    def __init__(self, *, reconnect: RetryPolicy = None, batch_interval: int = 0, max_queued: int = 1000,
+                 parent: QtCore.QObject = None):
+        if QtWebSockets is None:
+            raise RuntimeError('QtWebSockets must be installed to use WebSockets!')
+        
+        # Super call
+        super(WebSocketPool, self).__init__(parent=parent)
+        
+        # Public attributes
+        self.reconnect = reconnect
+        self.batch_interval = batch_interval
+        self.max_queued = max_queued
+        
+        # Private attributes
+        self._connections: typing.Dict[str, _Connection] = {}
+        
+        # Attribute validation
+        if self.reconnect is None:
+            self.reconnect = RetryPolicy(max_attempts=10, backoff=0.5, max_backoff=30)
+    
+    # Pool methods
+    def open(self, url: typing.Union[QtCore.QUrl, str], *,
+             headers: typing.Dict[typing.AnyStr, typing.AnyStr] = None) -> WebSocket:
+        """Returns a new handle on the connection for `url`.  `headers` are only
+        sent if a new connection has to be made."""
+        url = QtCore.QUrl(url)
+        key = url.toString(QtCore.QUrl.NormalizePathSegments)
+        connection = self._connections.get(key)
+        
+        if connection is None:
+            request = QtNetwork.QNetworkRequest(url)
+            
+            for k, v in (headers or {}).items():
+                request.setRawHeader(_encode(k), _encode(v))
+            
+            connection = self._connections[key] = _Connection(self, key, request)
+            connection.open()
+        
+        return WebSocket(connection)
+    
+    def close(self):
+        """Closes every connection in the pool."""
+        for connection in list(self._connections.values()):
+            connection.close()
+    
+    # Internal methods
+    def _forget(self, connection: _Connection):
+        """Removes a closed connection from the pool."""
+        if self._connections.get(connection.key) is connection:
+            del self._connections[connection.key]
+    
+    # Magic methods
+    def __len__(self) -> int:
+        return len(self._connections)
@@ -23,11 +23,12 @@
 # GNU Lesser General Public License along
 # with QtUtilities.  If not,
 # see <https://www.gnu.org/licenses/>.
+import asyncio
 import logging
 
 from PyQt5 import QtCore
 
-__all__ = {"wait_for_signal", "wait_for_signal_or", "wait_for_signal_and"}
+__all__ = {"wait", "wait_for_signal", "wait_for_signal_or", "wait_for_signal_and"}
 
 logger = logging.getLogger(__name__)
 
@@ -40,20 +41,24 @@ def wait_for_signal(signal, *, timeout: int = None):
     before timing out."""
     loop = QtCore.QEventLoop()
     timer = QtCore.QTimer()
+    timer.setSingleShot(True)
     emitted = False
     returnables = None
 
     def on_emit(*args):
+        nonlocal emitted, returnables
+        
         emitted = True
         returnables = args
+        loop.quit()
     
     try:
         signal.connect(on_emit)
-        signal.connect(loop.quit)
+        timer.timeout.connect(loop.quit)
         
         if timeout is not None:
             if timeout > 0:
-                timer.singleShot(timeout, loop.quit)
+                timer.start(timeout)
         
         loop.exec()
     
@@ -67,6 +72,12 @@ def wait_for_signal(signal, *, timeout: int = None):
         if timer.isActive():
             timer.stop()
         
+        try:
+            signal.disconnect(on_emit)
+        
+        except TypeError:
+            pass
+        
         loop.deleteLater()
         timer.deleteLater()
 
@@ -123,9 +134,12 @@ def wait_for_signal_or(*signals, timeout: int = None):
     :returns bool: Whether or not the signal emitted."""
     loop = QtCore.QEventLoop()
     timer = QtCore.QTimer()
+    timer.setSingleShot(True)
     emitted = False
     
     def on_emit():
+        nonlocal emitted
+        
         emitted = True
     
     try:
@@ -134,9 +148,11 @@ def wait_for_signal_or(*signals, timeout: int = None):
                 signal.connect(on_emit)
                 signal.connect(loop.quit)
         
+        timer.timeout.connect(loop.quit)
+        
         if timeout is not None:
             if timeout > 0:
-                timer.singleShot(timeout, loop.quit)
+                timer.start(timeout)
         
         loop.exec()
     
@@ -154,3 +170,32 @@ def wait_for_signal_or(*signals, timeout: int = None):
         loop.deleteLater()
     
     return emitted
+
+
+async def wait(signal, *, timeout: int = None) -> tuple:
+    """Waits for `signal` without spinning a nested event loop.
+    This coroutine must be awaited on an asyncio loop driven by
+    the Qt event loop, like `QtUtilities.aio.QtEventLoop`.
+    :param signal: The signal to wait for.
+    :param timeout: The amount of milliseconds to wait
+    before timing out.  Like `wait_for_signal`, only
+    positive timeouts are applied.
+    
+    :returns tuple: The arguments the signal was emitted with.
+    :raises asyncio.TimeoutError: The signal wasn't emitted in time."""
+    future = asyncio.get_running_loop().create_future()
+    
+    def on_emit(*args):
+        if not future.done():
+            future.set_result(args)
+    
+    signal.connect(on_emit)
+    
+    try:
+        if timeout is None or timeout <= 0:
+            return await future
+        
+        return await asyncio.wait_for(future, timeout / 1000)
+    
+    finally:
+        signal.disconnect(on_emit)
@@ -77,6 +77,22 @@ class Context(QtWidgets.QDialog):
             if self._progress.value() < self._progress.maximum():
                 self._progress.setValue(self._progress.value() + 1)
     
+    def update_progress(self, current: int, total: int):
+        """Sets the progress' value to `current` out of `total`.  If `total` is
+        unknown (less than 1), the progress bar will display as busy.
+        
+        This is compatible with `QtUtilities.requests.Future.progress`."""
+        if total < 1:
+            self._progress.setRange(0, 0)
+        
+        else:
+            # QProgressBar only supports 32-bit values
+            if total > 2 ** 31 - 1:
+                current, total = current * 10000 // total, 10000
+            
+            self._progress.setRange(0, total)
+            self._progress.setValue(total - current if self._reversed else current)
+    
     # Label Methods #
     def set_text(self, text: str):
         """Sets the label's text to `text`."""
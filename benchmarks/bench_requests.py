@@ -0,0 +1,450 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+"""Benchmarks the requests package against a local HTTP server.
+
+The server runs in its own process, so its memory and CPU time aren't
+counted against the factory.  Results are written as JSON, which can be
+compared against an earlier run with `--compare`.  `--path` benchmarks the
+QtUtilities package of another checkout, like an earlier release, so
+benchmarks this suite has that the release doesn't support are skipped:
+    
+    git worktree add ../before <revision>
+    python benchmarks/bench_requests.py --path ../before --output before.json
+    python benchmarks/bench_requests.py --output after.json --compare before.json
+"""
+import argparse
+import gc
+import http.server
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+
+from PyQt5 import QtCore, QtNetwork
+
+QtUtilities = requests = None  # Imported by `_load`, from the checkout being benchmarked
+
+SIZES = [1024, 64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 128 * 1024 ** 2, 500 * 1024 ** 2]
+ITEM = b'"' + b'x' * 61 + b'"'  # A 63 byte JSON string, 64 bytes with its separator
+SMALL = b'{"ok": true}'
+
+
+# Server
+def _json_body(size: int) -> bytes:
+    """Returns a JSON array of strings that's roughly `size` bytes long."""
+    count = max(1, (size - 2) // (len(ITEM) + 1))
+    
+    return b'[' + b','.join([ITEM] * count) + b']'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves the benchmark's routes.  The server is bundled with the suite,
+    so it works the same against every version of the package."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    bodies: typing.Dict[int, bytes] = {}
+    
+    def do_GET(self):
+        path = self.path.partition('?')[0]
+        
+        if path == '/small':
+            body = SMALL
+        
+        elif path.startswith('/json/') and path[6:].isdigit():
+            size = int(path[6:])
+            
+            if size not in self.bodies:
+                # Only the latest body is kept, so the largest sizes fit in memory
+                self.bodies.clear()
+                self.bodies[size] = _json_body(size)
+            
+            body = self.bodies[size]
+        
+        else:
+            self.send_error(404)
+            
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(port: multiprocessing.Queue, stop: multiprocessing.Event):
+    """Runs the benchmark server until `stop` is set."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port.put(f'http://127.0.0.1:{server.server_address[1]}')
+    
+    stop.wait()
+    server.shutdown()
+    server.server_close()
+
+
+class Server:
+    """Runs the benchmark server in a child process."""
+    
+    def __init__(self):
+        self.base_url = ''
+        self._stop = None
+        self._process = None
+    
+    def __enter__(self) -> 'Server':
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        
+        self._stop = context.Event()
+        self._process = context.Process(target=_serve, args=(queue, self._stop), daemon=True)
+        self._process.start()
+        self.base_url = queue.get(timeout=30)
+        
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._process.join(10)
+
+
+# Compatibility
+def _load(path: typing.Optional[str]):
+    """Imports the QtUtilities package being benchmarked from the checkout at
+    `path`, or from this checkout."""
+    global QtUtilities, requests
+    
+    sys.path.insert(0, os.path.abspath(path) if path else os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    
+    import QtUtilities
+    from QtUtilities import requests
+
+
+def _factory() -> 'requests.Factory':
+    """Creates a factory that sends every request, on versions that coalesce
+    identical requests.
+    
+    The manager's cookie jar is created from Python, since early versions read
+    it through a protected method PyQt only exposes on Python objects."""
+    manager = QtNetwork.QNetworkAccessManager()
+    manager.setCookieJar(QtNetwork.QNetworkCookieJar())
+    
+    if 'coalesce' in inspect.signature(requests.Factory).parameters:
+        return requests.Factory(manager, coalesce=False)
+    
+    return requests.Factory(manager)
+
+
+def _body_size(response: 'requests.Response') -> int:
+    """Returns the size of a response's body without copying it, on versions
+    that expose the body as a view."""
+    if hasattr(type(response), 'body'):
+        return len(response.body)
+    
+    return response.raw_content.getbuffer().nbytes
+
+
+# Measurements
+def _rss() -> int:
+    """Returns the process's resident memory in bytes, or 0 if it can't be
+    read on this platform."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def _percentiles(samples: typing.List[float]) -> typing.Dict[str, float]:
+    """Summarizes latency samples, in milliseconds."""
+    ordered = sorted(samples)
+    
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    
+    return {
+        'mean': statistics.mean(ordered) * 1000,
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1] * 1000
+    }
+
+
+def bench_sequential(factory: 'requests.Factory', url: str, count: int) -> dict:
+    """Issues `count` requests one after another through `Factory.request`."""
+    samples = []
+    start = time.perf_counter()
+    
+    for _ in range(count):
+        begin = time.perf_counter()
+        response = factory.request('GET', url)
+        samples.append(time.perf_counter() - begin)
+        
+        if not response.is_okay():
+            raise RuntimeError(f'Request failed! ({response.error_string})')
+    
+    elapsed = time.perf_counter() - start
+    
+    return {'requests': count, 'seconds': elapsed, 'requests_per_second': count / elapsed,
+            'latency_ms': _percentiles(samples)}
+
+
+def bench_prepared(factory: 'requests.Factory', url: str, count: int) -> dict:
+    """Sends the same PreparedRequest `count` times, one after another, and
+    times how long building the requests takes on its own."""
+    params = {'page': '1', 'per_page': '100'}
+    headers = {'Accept': 'application/json', 'User-Agent': 'bench_requests', 'X-Client': 'QtUtilities'}
+    prepared = factory.prepare('GET', url, params=params, headers=headers)
+    samples = []
+    start = time.perf_counter()
+    
+    for _ in range(count):
+        begin = time.perf_counter()
+        response = factory.send(prepared)
+        samples.append(time.perf_counter() - begin)
+        
+        if not response.is_okay():
+            raise RuntimeError(f'Request failed! ({response.error_string})')
+    
+    elapsed = time.perf_counter() - start
+    
+    begin = time.perf_counter()
+    
+    for _ in range(count):
+        factory._prepare(url, params=params, headers=headers)
+    
+    rebuilt = time.perf_counter() - begin
+    begin = time.perf_counter()
+    
+    for _ in range(count):
+        prepared.build()
+    
+    built = time.perf_counter() - begin
+    
+    return {'requests': count, 'seconds': elapsed, 'requests_per_second': count / elapsed,
+            'latency_ms': _percentiles(samples), 'prepare_us': rebuilt / count * 1e6, 'build_us': built / count * 1e6}
+
+
+def bench_concurrent(factory: 'requests.Factory', url: str, count: int, concurrency: int) -> dict:
+    """Issues `count` requests at once through `Factory.gather`."""
+    start = time.perf_counter()
+    responses = factory.gather([url] * count, max_in_flight=concurrency, max_per_host=concurrency)
+    elapsed = time.perf_counter() - start
+    
+    failed = sum(1 for r in responses if r is None or not r.is_okay())
+    
+    return {'requests': count, 'concurrency': concurrency, 'failed': failed, 'seconds': elapsed,
+            'requests_per_second': count / elapsed}
+
+
+def bench_memory(factory: 'requests.Factory', url: str, count: int) -> dict:
+    """Measures the memory held by `count` live responses."""
+    gc.collect()
+    tracemalloc.start()
+    before, rss = tracemalloc.take_snapshot(), _rss()
+    
+    responses = [factory.request('GET', url) for _ in range(count)]
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    gc.collect()
+    
+    after, rss = tracemalloc.take_snapshot(), _rss() - rss
+    tracemalloc.stop()
+    
+    python = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del responses
+    
+    return {'responses': count, 'python_bytes_per_response': python / count,
+            'rss_bytes_per_response': rss / count if rss > 0 else None}
+
+
+def bench_body(factory: 'requests.Factory', url: str, repeat: int) -> dict:
+    """Measures fetching a body, then decoding it through
+    `Response.content` and `Response.json`."""
+    fetch, content, parse = [], [], []
+    peak = 0
+    
+    for _ in range(repeat):
+        gc.collect()
+        rss = _rss()
+        
+        begin = time.perf_counter()
+        response = factory.request('GET', url)
+        fetch.append(time.perf_counter() - begin)
+        
+        if not response.is_okay():
+            raise RuntimeError(f'Request failed! ({response.error_string})')
+        
+        begin = time.perf_counter()
+        _ = response.content
+        content.append(time.perf_counter() - begin)
+        
+        begin = time.perf_counter()
+        _ = response.json()
+        parse.append(time.perf_counter() - begin)
+        
+        peak = max(peak, _rss() - rss)
+        actual = _body_size(response)
+        
+        del response, _
+    
+    mb = actual / 1024 ** 2
+    
+    return {
+        'bytes': actual,
+        'fetch_seconds': min(fetch),
+        'fetch_mb_per_second': mb / min(fetch),
+        'content_seconds': min(content),
+        'content_mb_per_second': mb / min(content) if min(content) > 0 else None,
+        'json_seconds': min(parse),
+        'json_mb_per_second': mb / min(parse) if min(parse) > 0 else None,
+        'rss_growth_bytes': peak or None
+    }
+
+
+# Reporting
+def _environment() -> dict:
+    return {
+        'qtutilities': '.'.join(map(str, QtUtilities.__version__)),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'qt': QtCore.QT_VERSION_STR,
+        'pyqt': QtCore.PYQT_VERSION_STR,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+
+
+def _flatten(results: dict, prefix: str = '') -> typing.Dict[str, float]:
+    flat = {}
+    
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    
+    return flat
+
+
+def compare(current: dict, baseline: dict):
+    """Prints the relative change of every metric between two runs."""
+    old = _flatten(baseline['results'])
+    
+    print(f'Comparing against {baseline["environment"]["qtutilities"]} ({baseline["environment"]["timestamp"]})')
+    
+    for key, value in _flatten(current['results']).items():
+        if key in old and old[key]:
+            print(f'  {key:<60} {old[key]:>14.3f} -> {value:>14.3f} ({(value - old[key]) / old[key]:+.1%})')
+
+
+def _positive(value: str) -> int:
+    """Parses an argument that must be at least 1."""
+    number = int(value)
+    
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not at least 1')
+    
+    return number
+
+
+def main(argv: typing.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=_positive, default=2000, help='The amount of small requests to time.')
+    parser.add_argument('--concurrency', type=_positive, default=16,
+                        help='The concurrency of the concurrent benchmark.')
+    parser.add_argument('--responses', type=_positive, default=1000,
+                        help='The amount of responses to measure memory with.')
+    parser.add_argument('--sizes', type=_positive, nargs='+', default=SIZES, help='The body sizes to time, in bytes.')
+    parser.add_argument('--repeat', type=_positive, default=3, help='The amount of times each body size is fetched.')
+    parser.add_argument('--output', default='benchmark.json', help='The file to write the results to.')
+    parser.add_argument('--compare', help='A previous results file to compare against.')
+    parser.add_argument('--path', help='The checkout whose QtUtilities package is benchmarked, instead of this one.')
+    args = parser.parse_args(argv)
+    
+    _load(args.path)
+    
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    results = {}
+    
+    with Server() as server:
+        factory = _factory()
+        small = server.base_url + '/small'
+        
+        factory.request('GET', small)  # Warms up the connection
+        
+        results['sequential'] = bench_sequential(factory, small, args.requests)
+        
+        if hasattr(factory, 'prepare'):
+            results['prepared'] = bench_prepared(factory, small, args.requests)
+        
+        else:
+            print('Skipping the prepared benchmark, as Factory.prepare is unavailable.', file=sys.stderr)
+        
+        if hasattr(factory, 'gather'):
+            results['concurrent'] = bench_concurrent(factory, small, args.requests, args.concurrency)
+        
+        else:
+            print('Skipping the concurrent benchmark, as Factory.gather is unavailable.', file=sys.stderr)
+        
+        results['memory'] = bench_memory(factory, small, args.responses)
+        results['bodies'] = {str(size): bench_body(factory, f'{server.base_url}/json/{size}', args.repeat)
+                             for size in args.sizes}
+    
+    report = {'environment': _environment(), 'results': results}
+    
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    
+    print(json.dumps(report, indent=2))
+    
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+    
+    del app
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
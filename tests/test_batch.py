@@ -0,0 +1,96 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import unittest
+
+from PyQt5 import QtCore
+
+from QtUtilities import requests
+from QtUtilities.requests.testing import FakeTransport
+
+_app = None
+
+
+def setUpModule():
+    global _app
+    _app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(latency=0.05)
+        self.factory = requests.Factory(transport=self.transport, coalesce=False)
+        self.finished = 0
+    
+    def _batch(self, count: int, **kwargs) -> requests.Batch:
+        batch = requests.Batch(self.factory, [f'http://example.com/{i}' for i in range(count)], **kwargs)
+        batch.finished.connect(self._on_finished)
+        
+        return batch
+    
+    def _on_finished(self):
+        self.finished += 1
+    
+    def test_finishes_once(self):
+        batch = self._batch(3)
+        batch.start()
+        
+        QtCore.QTimer.singleShot(500, _app.quit)
+        _app.exec()
+        
+        self.assertTrue(batch.done())
+        self.assertEqual(self.finished, 1)
+    
+    def test_cancel_finishes_once(self):
+        batch = self._batch(4, max_in_flight=2)
+        batch.start()
+        batch.cancel()
+        batch.cancel()
+        
+        QtCore.QTimer.singleShot(200, _app.quit)
+        _app.exec()
+        
+        self.assertTrue(batch.done())
+        self.assertEqual(self.finished, 1)
+        self.assertEqual(len(self.transport.requests), 2)
+    
+    def test_cancel_unstarted_finishes_once(self):
+        batch = self._batch(2)
+        batch.cancel()
+        batch.start()
+        
+        self.assertTrue(batch.done())
+        self.assertEqual(self.finished, 1)
+    
+    def test_empty_batch_finishes_once(self):
+        batch = self._batch(0)
+        batch.start()
+        batch.cancel()
+        
+        self.assertEqual(self.finished, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import unittest
+
+from PyQt5 import QtCore, QtNetwork
+
+from QtUtilities import requests
+from QtUtilities.requests.testing import CannedResponse, FakeTransport
+
+_app = None
+
+
+def setUpModule():
+    global _app
+    _app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class FakeTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(seed=1)
+        self.factory = requests.Factory(transport=self.transport)
+    
+    def test_get(self):
+        self.transport.add('/json', body=b'{"a": 1}', headers={'Content-Type': 'application/json'})
+        
+        response = self.factory.get('http://example.com/json', params={'q': '1'})
+        
+        self.assertTrue(response.is_okay())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.json(), {'a': 1})
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        self.assertEqual(self.transport.requests[-1].op, 'GET')
+        self.assertEqual(self.transport.requests[-1].url, 'http://example.com/json?q=1')
+    
+    def test_post(self):
+        self.transport.add('/echo', CannedResponse(status=201, body=b'created'), op='POST')
+        
+        response = self.factory.post('http://example.com/echo', data=b'hello', headers={'X-Test': 'yes'})
+        
+        self.assertEqual(response.status, 201)
+        self.assertEqual(response.content, 'created')
+        self.assertEqual(self.transport.requests[-1].body, b'hello')
+        self.assertEqual(self.transport.requests[-1].headers['X-Test'], 'yes')
+    
+    def test_error_reply(self):
+        self.transport.add('/refused', status=0, error=QtNetwork.QNetworkReply.ConnectionRefusedError)
+        
+        response = self.factory.get('http://example.com/refused')
+        
+        self.assertFalse(response.is_okay())
+        self.assertEqual(response.status, 0)
+        self.assertEqual(response.code, QtNetwork.QNetworkReply.ConnectionRefusedError)
+    
+    def test_status_error(self):
+        response = self.factory.get('http://example.com/missing')
+        
+        self.assertEqual(response.status, 404)
+        self.assertEqual(response.code, QtNetwork.QNetworkReply.ContentNotFoundError)
+    
+    def test_retry(self):
+        self.factory.retry = requests.RetryPolicy(backoff=0.001, jitter=False)
+        self.transport.add('/flaky', status=503)
+        self.transport.add('/flaky', body=b'ok')
+        
+        response = self.factory.get('http://example.com/flaky')
+        
+        self.assertEqual(response.content, 'ok')
+        self.assertEqual(len(self.transport.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import unittest
+
+from PyQt5 import QtCore
+
+from QtUtilities import requests
+from QtUtilities.requests.testing import FakeTransport
+
+_app = None
+
+
+def setUpModule():
+    global _app
+    _app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class FutureTest(unittest.TestCase):
+    def test_first_callback(self):
+        future = requests.Future()
+        order = []
+        
+        future.add_done_callback(lambda _: order.append('second'))
+        future.add_done_callback(lambda _: order.append('first'), first=True)
+        future._set_result(None)
+        
+        self.assertEqual(order, ['first', 'second'])
+    
+    def test_timeout_marks_response_first(self):
+        factory = requests.Factory(transport=FakeTransport(latency=0.5))
+        future = factory.submit('GET', 'http://example.com/slow', timeout=50)
+        seen = []
+        
+        future.add_done_callback(lambda f: seen.append(f.result().timed_out))
+        
+        self.assertTrue(future.result().timed_out)
+        self.assertEqual(seen, [True])
@@ -0,0 +1,62 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import json
+import unittest
+
+from QtUtilities.requests.jsonstream import iter_items
+
+
+def _split(document: bytes, size: int = 1):
+    """Splits a document into chunks of `size` bytes."""
+    return [document[i:i + size] for i in range(0, len(document), size)]
+
+
+class IterItemsTest(unittest.TestCase):
+    def test_numbers_split_at_every_byte(self):
+        document = b'{"a": [3.5e10, -0.25E-3, 12.25, 1e3, 7, 0]}'
+        
+        self.assertEqual(list(iter_items(_split(document), 'a')), json.loads(document)['a'])
+    
+    def test_numbers_split_after_fraction_or_exponent(self):
+        self.assertEqual(list(iter_items([b'[1.5, 12.', b'25]'])), [1.5, 12.25])
+        self.assertEqual(list(iter_items([b'[1e', b'3]'])), [1e3])
+        self.assertEqual(list(iter_items([b'[2E+', b'2, 4]'])), [2e2, 4])
+    
+    def test_values_split_at_every_byte(self):
+        document = '[true, null, "ü, ]", {"k": [1, 2.0]}, [], -1]'.encode()
+        
+        self.assertEqual(list(iter_items(_split(document))), json.loads(document))
+    
+    def test_missing_path(self):
+        self.assertEqual(list(iter_items([b'{"a": [1]}'], 'b')), [])
+    
+    def test_invalid_document(self):
+        with self.assertRaises(ValueError):
+            list(iter_items(_split(b'[1 2]')))
+
+
+if __name__ == '__main__':
+    unittest.main()
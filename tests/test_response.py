@@ -0,0 +1,71 @@
+# This file is part of QtUtilities.
+#
+# QtUtilities is free software:
+# you can redistribute it
+# and/or modify it under the
+# terms of the GNU Lesser General
+# Public License as published by
+# the Free Software Foundation,
+# either version 3 of the License,
+# or (at your option) any later
+# version.
+#
+# QtUtilities is distributed in
+# the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without
+# even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the
+# GNU Lesser General Public License along
+# with QtUtilities.  If not,
+# see <https://www.gnu.org/licenses/>.
+import math
+import unittest
+
+from PyQt5 import QtCore
+
+from QtUtilities import requests
+from QtUtilities.requests.testing import FakeTransport
+
+_app = None
+
+
+def setUpModule():
+    global _app
+    _app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class ResponseJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.factory = requests.Factory(transport=self.transport)
+    
+    def _json(self, body: bytes, **kwargs):
+        self.transport.add('/json', body=body, headers={'Content-Type': 'application/json; charset=utf-8'})
+        
+        return self.factory.get('http://example.com/json').json(**kwargs)
+    
+    def test_nan(self):
+        data = self._json(b'{"a": NaN, "b": Infinity}')
+        
+        self.assertTrue(math.isnan(data['a']))
+        self.assertEqual(data['b'], math.inf)
+    
+    def test_big_integer(self):
+        self.assertEqual(self._json(b'{"a": 18446744073709551616}'), {'a': 18446744073709551616})
+    
+    def test_byte_order_mark(self):
+        self.assertEqual(self._json(b'\xef\xbb\xbf{"a": 1}'), {'a': 1})
+    
+    def test_memoized(self):
+        self.transport.add('/json', body=b'[1, 2]')
+        response = self.factory.get('http://example.com/json')
+        
+        self.assertIs(response.json(), response.json())
+    
+    def test_binary_encoder(self):
+        self.assertEqual(self._json(b'[1]', encoder=lambda body: bytes(body), binary=True), b'[1]')